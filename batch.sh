@@ -1,28 +1,70 @@
 configfile=$1
+resultsdir=$2  # optional: results directory of a campaign to resume
 
 repetitions=$(grep 'repetitions:' $configfile | cut -d: -f2 | tr -d ' ' | tr -d '"')
 testcase=$(grep 'testcase:' $configfile | cut -d: -f2 | tr -d ' ' | tr -d '"')
+pack=$(grep '^pack:' $configfile | cut -d: -f2 | tr -d ' ' | tr -d '"')
+pack_size=$(grep '^pack_size:' $configfile | cut -d: -f2 | tr -d ' ' | tr -d '"')
+pack_size=${pack_size:-2}
 
-DATE_WITH_TIME=`date "+%Y-%m-%d_%H-%M-%S"`
-resultsdir=$PWD/tmp_benchmarks_results/$DATE_WITH_TIME-$testcase/results
-mkdir -p $resultsdir
+# Time limit in minutes of an allocation for a single repetition
+REPETITION_TIME=300
 
-cp $configfile $resultsdir/config.yaml
+# Runs job.sh in an allocation with the given time limit in minutes for the
+# given run directories
+run_allocation() {
+	salloc --constraint mc \
+		-A ich004m \
+		--mem=120GB \
+		--time=$1 \
+		--nodes 33 \
+		--ntasks 66 \
+		--cpus-per-task 36 \
+		--hint=multithread \
+		job.sh $configfile "${@:2}"
+}
 
+if [ -z "$resultsdir" ]; then
+	DATE_WITH_TIME=`date "+%Y-%m-%d_%H-%M-%S"`
+	resultsdir=$PWD/tmp_benchmarks_results/$DATE_WITH_TIME-$testcase/results
+	mkdir -p $resultsdir
+	cp $configfile $resultsdir/config.yaml
+else
+	echo "==== BATCHRUNNER: Resuming campaign in $resultsdir ==="
+fi
+
+n_packed=0
 for (( c=1; c<=$repetitions; c++ ))
 do
 		
 	RUNDIR=$resultsdir/$c
 
+	if python3 campaign_journal.py $resultsdir $configfile $c; then
+		echo "==== BATCHRUNNER: Repetition $c already completed, skipping ==="
+		continue
+	fi
+
+	if [ "$pack" = "true" ]; then
+		# Up to pack_size open repetitions run in one allocation, whose
+		# time limit grows with their number, as the large steps of all
+		# repetitions still run one after another
+		PACKED_RUNDIRS="$PACKED_RUNDIRS $RUNDIR"
+		n_packed=$((n_packed + 1))
+		if [ $n_packed -ge $pack_size ]; then
+			echo "==== BATCHRUNNER: Starting $n_packed packed repetitions in $resultsdir ==="
+			run_allocation $((n_packed * REPETITION_TIME)) $PACKED_RUNDIRS
+			PACKED_RUNDIRS=""
+			n_packed=0
+		fi
+		continue
+	fi
+
 	echo "==== BATCHRUNNER: Starting repetition $c in $RUNDIR ==="
 
-	salloc --constraint mc \
-		-A ich004m \
-		--mem=120GB \
-		--time=300 \
-		--nodes 33 \
-		--ntasks 66 \
-		--cpus-per-task 36 \
-		--hint=multithread \
- 		job.sh $configfile $RUNDIR
+	run_allocation $REPETITION_TIME $RUNDIR
 done
+
+if [ -n "$PACKED_RUNDIRS" ]; then
+	echo "==== BATCHRUNNER: Starting $n_packed packed repetitions in $resultsdir ==="
+	run_allocation $((n_packed * REPETITION_TIME)) $PACKED_RUNDIRS
+fi
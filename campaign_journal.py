@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+from datetime import datetime
+import threading
+import json
+import sys
+import os
+
+import helpers
+
+
+class CampaignJournal:
+    """
+    Journal of the benchmark steps of a campaign.
+
+    The journal is a JSON-lines file in the results directory of a campaign.
+    Each line records the state of a single step, identified by its test
+    case, repetition and number of NEST tasks. Later lines override earlier
+    ones, so the last line of a step holds its current state:
+      * started: the step was started, but did not end (yet)
+      * completed: the step ended and its data is complete
+      * failed: the step ended without producing valid data
+    """
+
+    def __init__(self, resultsdir):
+        """
+        :param resultsdir: Results directory of the campaign
+        """
+
+        self.fname = os.path.join(resultsdir, "journal.jsonl")
+        self.lock = threading.Lock()
+        self.steps = {}
+
+        if os.path.isfile(self.fname):
+            with open(self.fname, 'r') as infile:
+                for line in infile:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.steps[self.key(**entry)] = entry
+
+    @staticmethod
+    def key(testcase, repetition, n_tasks, **kwargs):
+        return (testcase, str(repetition), int(n_tasks))
+
+    def record(self, testcase, repetition, n_tasks, state, artifacts=None):
+        """
+        Records a new state of a step.
+        :param testcase: Test case of the step
+        :param repetition: Repetition of the step
+        :param n_tasks: Number of NEST tasks of the step
+        :param state: New state of the step
+        :param artifacts: List of files the step produced
+        """
+
+        entry = {
+            "testcase": testcase,
+            "repetition": str(repetition),
+            "n_tasks": int(n_tasks),
+            "state": state,
+            "artifacts": artifacts or [],
+            "time": datetime.now().isoformat(timespec='seconds'),
+        }
+        with self.lock:
+            self.steps[self.key(**entry)] = entry
+            with open(self.fname, 'a') as outfile:
+                outfile.write(json.dumps(entry) + "\n")
+
+    def state(self, testcase, repetition, n_tasks):
+        """
+        Returns the current state of a step, or None if it never started.
+        """
+
+        entry = self.steps.get(self.key(testcase, repetition, n_tasks))
+        return entry["state"] if entry else None
+
+    def is_completed(self, testcase, repetition, n_tasks):
+        return self.state(testcase, repetition, n_tasks) == "completed"
+
+
+if __name__ == '__main__':
+
+    # Exits with 0 if all steps of the given repetition are completed
+    if len(sys.argv) != 4:
+        print("Usage: campaign_journal.py <resultsdir> <configfile> <repetition>")
+        exit(2)
+
+    resultsdir, config_fname, repetition = sys.argv[1:]
+    config = helpers.get_config(config_fname)
+    journal = CampaignJournal(resultsdir)
+    n_tasks = config.get('n_tasks', [])
+    done = bool(n_tasks) and all(
+        journal.is_completed(config['testcase'], repetition, n) for n in n_tasks
+    )
+    exit(0 if done else 1)
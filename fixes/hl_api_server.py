@@ -19,8 +19,17 @@
 # You should have received a copy of the GNU General Public License
 # along with NEST.  If not, see <http://www.gnu.org/licenses/>.
 
+import bisect
+import collections
+import concurrent.futures
 import importlib
+import hashlib
 import inspect
+import logging
+import reprlib
+import threading
+import pickle
+import queue
 import io
 import sys
 import glob
@@ -33,23 +42,58 @@ from werkzeug.exceptions import abort
 from werkzeug.wrappers import Response
 
 import nest
+import numpy
 
 import RestrictedPython
 import time
 
-import traceback
-
-from copy import deepcopy
-
 import os
 
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
 import site
-site.addsitedir('/opt/data')
+USER_MODULES_DIR = '/opt/data'
+site.addsitedir(USER_MODULES_DIR)
 
 MODULES = os.environ.get('NEST_SERVER_MODULES', 'nest').split(',')
+MODULES_CHECK_INTERVAL = float(os.environ.get('NEST_SERVER_MODULES_CHECK_INTERVAL', 1.0))  # noqa
+CODE_CACHE_SIZE = int(os.environ.get('NEST_SERVER_CODE_CACHE_SIZE', 64))
+SORT_EVENTS = bool(os.environ.get('NEST_SERVER_SORT_EVENTS', False))
+LOG_LEVEL = os.environ.get('NEST_SERVER_LOG_LEVEL', 'WARNING').upper()
+LOG_MAX_LENGTH = int(os.environ.get('NEST_SERVER_LOG_MAX_LENGTH', 500))
+MAX_SESSIONS = int(os.environ.get('NEST_SERVER_MAX_SESSIONS', 16))
+SESSION_LIFETIME = float(os.environ.get('NEST_SERVER_SESSION_LIFETIME', 3600))
 RESTRICTION_OFF = bool(os.environ.get('NEST_SERVER_RESTRICTION_OFF', False))
 EXCEPTION_ERROR_STATUS = 400
 
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPE = 'application/vnd.msgpack'
+NDARRAY_EXT_TYPE = 1
+
+# Calls for which the responses of all processes are known to be the same
+# or already reduced on the master
+MASTER_RESPONSE_CALLS = ('exec', 'CloseSession', 'Create', 'GetDefaults',
+                         'GetKernelStatus', 'Reduce', 'RunSteps', 'ScheduleUpdates',
+                         'SetKernelStatus', 'SetStatus')
+
+# Fields of device status dictionaries needed by merge_dicts()
+MERGE_FIELDS = ('element_type', 'record_to', 'n_events')
+
+# Operations of the Reduce call (see reduce_quantity())
+REDUCE_OPS = ('count', 'sum', 'mean', 'histogram')
+
+# Alignment of arrays in the buffer sent by gather_response()
+BUFFER_ALIGNMENT = 16
+
+# Upper bounds of the buckets of the call duration histograms in seconds
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0, 300.0)
+
+# Names of the parameters of PyNEST functions that take a NodeCollection
+NODE_PARAMETERS = ('nodes', 'source', 'target', 'pre', 'post')
+
 if RESTRICTION_OFF:
     msg = 'NEST Server runs without a RestrictedPython trusted environment.'
     print(f'***\n*** WARNING: {msg}\n***')
@@ -60,6 +104,7 @@ __all__ = [
     'do_exec',
     'set_mpi_comm',
     'run_mpi_app',
+    'run_mpi_worker',
     'nestify',
 ]
 
@@ -67,6 +112,33 @@ app = Flask(__name__)
 CORS(app)
 
 mpi_comm = None
+logger = logging.getLogger('nest.server')
+event_cursors = {}  # (client, recorder) -> (biological time, number of events)
+mpi_stats = collections.defaultdict(lambda: {
+    'calls': 0,
+    'bcast_time': 0.0,
+    'bcast_bytes': 0,
+    'gather_time': 0.0,
+    'gather_bytes': 0,
+})
+
+
+@app.before_request
+def start_request_timer():
+    flask.g.request_tic = time.perf_counter()
+
+
+@app.after_request
+def add_server_time(response):
+    """Report the time spent in the server for timing on the client side.
+    """
+    if 'request_tic' in flask.g:
+        server_time = time.perf_counter() - flask.g.request_tic
+        response.headers['X-Nest-Server-Time'] = f'{server_time:.7f}'
+    route = request.url_rule.rule if request.url_rule else 'unknown'
+    metrics.observe_request(route, request.content_length or 0,
+                            response.content_length or 0)
+    return response
 
 
 @app.route('/', methods=['GET'])
@@ -80,20 +152,30 @@ def index():
 def do_exec(args, kwargs):
     try:
         source_code = kwargs.get('source', '')
-        source_cleaned = clean_code(source_code)
+        code = code_cache.get(source_code, RESTRICTION_OFF)
 
-        locals_ = dict()
-        response = dict()
-        if RESTRICTION_OFF:
-            with Capturing() as stdout:
-                exec(source_cleaned, get_globals(), locals_)
-            if len(stdout) > 0:
-                response['stdout'] = '\n'.join(stdout)
+        # Scripts of a session run in its namespace (see SessionStore)
+        session = kwargs.get('session')
+        if session is None:
+            locals_ = dict()
         else:
-            code = RestrictedPython.compile_restricted(source_cleaned, '<inline>', 'exec')  # noqa
-            exec(code, get_restricted_globals(), locals_)
-            if '_print' in locals_:
-                response['stdout'] = ''.join(locals_['_print'].txt)
+            locals_ = session_store.open(session, kwargs.get('session_lifetime'))
+            locals_.pop('_print', None)
+
+        response = dict()
+        try:
+            if RESTRICTION_OFF:
+                with Capturing() as stdout:
+                    exec(code, get_globals(), locals_)
+                if len(stdout) > 0:
+                    response['stdout'] = '\n'.join(stdout)
+            else:
+                exec(code, get_restricted_globals(), locals_)
+                if '_print' in locals_:
+                    response['stdout'] = ''.join(locals_['_print'].txt)
+        finally:
+            if session is not None:
+                session_store.used(session)
 
         if 'return' in kwargs:
             if isinstance(kwargs['return'], list):
@@ -102,18 +184,27 @@ def do_exec(args, kwargs):
                     data[variable] = locals_.get(variable, None)
             else:
                 data = locals_.get(kwargs['return'], None)
-            response['data'] = nest.serializable(data)
+            response['data'] = serializable(data)
         return response
 
     except Exception as e:
-        for line in traceback.format_exception(*sys.exc_info()):
-            print(line, flush=True)
+        log('exec', 'exception in script', level=logging.ERROR, exc_info=True)
         abort(Response(str(e), EXCEPTION_ERROR_STATUS))
 
 
-def log(call_name, msg):
-    msg = f'==> MASTER 0/{time.time():.7f} ({call_name}): {msg}'
-    print(msg, flush=True)
+def log(call_name, msg, *args, level=logging.DEBUG, exc_info=False):
+    """Log a message of the server.
+
+    The message is %-formatted with the given args only if the level is
+    enabled (see NEST_SERVER_LOG_LEVEL). Args that are not numbers are
+    shortened to at most NEST_SERVER_LOG_MAX_LENGTH characters.
+
+    """
+
+    if logger.isEnabledFor(level):
+        args = [arg if isinstance(arg, (int, float)) else Shortened(arg) for arg in args]
+        logger.log(level, msg, *args, exc_info=exc_info,
+                   extra={'call_name': call_name})
 
 
 def do_call(call_name, args=[], kwargs={}):
@@ -127,9 +218,19 @@ def do_call(call_name, args=[], kwargs={}):
 
     If the server is run with MPI, this function will first communicate
     the call type ("exec" or API call) and the args and kwargs to all
-    worker processes. Only then will it execute the call in the same
-    way as described above for the serial case. After the call, all
-    worker responses are collected, combined and returned.
+    worker processes in a single broadcast (see bcast_call()). Only
+    then will it execute the call in the same way as described above
+    for the serial case. After the call, all worker responses are
+    collected (see gather_response()), combined and returned. For calls
+    in MASTER_RESPONSE_CALLS, the worker responses are not collected.
+    If the call failed on a worker, the worker sends a WorkerFailure
+    instead of its response, which is raised on the master. For calls
+    whose responses are not collected, only the failure of any process
+    is reduced (see failed_anywhere()).
+
+    If call_name is "batch", args is a list of (call_name, args, kwargs)
+    tuples, which are executed in order in a single round of broadcast
+    and gather. The response is the list of the combined responses.
 
     Please note that this function must only be called on the master
     process (i.e., the task with rank 0) in a distributed scenario.
@@ -139,27 +240,349 @@ def do_call(call_name, args=[], kwargs={}):
     if mpi_comm is not None:
         assert mpi_comm.Get_rank() == 0
 
-    if mpi_comm is not None:
-        log(call_name, 'sending call bcast')
-        mpi_comm.bcast(call_name, root=0)
-        data = (args, kwargs)
-        log(call_name, f'sending data bcast, data={data}')
-        mpi_comm.bcast(data, root=0)
+    tic = time.perf_counter()
+    control_state.begin(call_name, args, kwargs)
+    try:
+        mpi_time = 0.0
+        if mpi_comm is not None:
+            log(call_name, 'sending call bcast, args=%s, kwargs=%s', args, kwargs)
+            bcast_tic = time.perf_counter()
+            bcast_call(call_name, args, kwargs)
+            mpi_time += time.perf_counter() - bcast_tic
+
+        # The exception is raised after the gather, so that the master
+        # takes part in it like the workers
+        error = None
+        local_tic = time.perf_counter()
+        try:
+            master_response = serializable(local_call(call_name, args, kwargs))
+        except Exception as e:
+            master_response, error = None, e
+        local_time = time.perf_counter() - local_tic
+
+        response = [master_response]
+        if mpi_comm is not None and needs_gather(call_name, args):
+            log(call_name, 'waiting for response gather')
+            gather_tic = time.perf_counter()
+            response = gather_response(call_name, response[0])
+            mpi_time += time.perf_counter() - gather_tic
+            log(call_name, 'received response gather, data=%s', response)
+        elif mpi_comm is not None:
+            reduce_tic = time.perf_counter()
+            failed = failed_anywhere(error is not None)
+            mpi_time += time.perf_counter() - reduce_tic
+            if failed and error is None:
+                raise Exception(f'{call_name} failed on a worker process, see its log.')
+
+        if error is not None:
+            raise error
+        for process_response in response:
+            if isinstance(process_response, WorkerFailure):
+                raise Exception(f'{call_name} failed on {process_response}')
+
+        if call_name == "batch":
+            response = combine_batch(args, response)
+        else:
+            response = combine(call_name, response)
+    except Exception:
+        control_state.end(call_name, args, kwargs, None, failed=True)
+        metrics.observe_call(call_name, time.perf_counter() - tic, failed=True)
+        raise
+
+    control_state.end(call_name, args, kwargs, response)
+    metrics.observe_call(call_name, time.perf_counter() - tic, local_time, mpi_time)
+    log(call_name, 'call took %.6f s, local call %.6f s',
+        time.perf_counter() - tic, local_time, level=logging.INFO)
+    return response
+
+
+def local_call(call_name, args, kwargs):
+    """Execute a call on the local process.
+    """
 
     if call_name == "exec":
-        master_response = do_exec(args, kwargs)
-    else:
-        call, args, kwargs = nestify(call_name, args, kwargs)
-        log(call_name, f'local call, args={args}, kwargs={kwargs}')
-        master_response = call(*args, **kwargs)
+        return do_exec(args, kwargs)
 
-    response = [nest.serializable(master_response)]
-    if mpi_comm is not None:
-        log(call_name, 'waiting for response gather')
-        response = mpi_comm.gather(response[0], root=0)
-        log(call_name, f'received response gather, data={response}')
+    if call_name == "batch":
+        return local_batch(args)
+
+    if call_name == "ResetKernel":
+        event_cursors.clear()
+        timeline.clear()
+        session_store.clear()
+
+    call, args, kwargs = nestify(call_name, args, kwargs)
+    if mpi_comm is not None and call_name in mpi_calls:
+        call = mpi_calls[call_name]
+    if call_name == "Simulate" and len(timeline) > 0:
+        call = simulate
+    log(call_name, 'local call, args=%s, kwargs=%s', args, kwargs)
+    return call(*args, **kwargs)
 
-    return combine(call_name, response)
+
+def local_batch(calls):
+    """Execute the calls of a batch in order on the local process.
+
+    The batch stops at the first call that fails, with an error that
+    names the call. On a worker, this error is sent to the master as
+    WorkerFailure (see run_mpi_worker()). Workers return None for calls
+    in MASTER_RESPONSE_CALLS, as these are not combined.
+    """
+
+    is_worker = mpi_comm is not None and mpi_comm.Get_rank() > 0
+    responses = []
+    for index, (call_name, args, kwargs) in enumerate(calls):
+        try:
+            response = local_call(call_name, args, kwargs)
+        except Exception as e:
+            raise Exception(f'Call {index} ({call_name}) of batch failed: {e}') from e
+        if is_worker and call_name in MASTER_RESPONSE_CALLS:
+            response = None
+        responses.append(response)
+    return responses
+
+
+def needs_gather(call_name, args):
+    """Tell if the responses of the workers are needed for a call.
+    """
+
+    if call_name == "batch":
+        return any(needs_gather(name, args) for name, args, _ in args)
+    return call_name not in MASTER_RESPONSE_CALLS
+
+
+def bcast_call(call_name=None, args=None, kwargs=None):
+    """Broadcast a call from the master to all workers.
+
+    The call name, args and kwargs are pickled on the master and sent
+    in a single broadcast. Returns the tuple of call name, args and
+    kwargs on all processes.
+
+    """
+
+    tic = time.perf_counter()
+    payload = None
+    if mpi_comm.Get_rank() == 0:
+        payload = pickle.dumps((call_name, args, kwargs), pickle.HIGHEST_PROTOCOL)
+    payload = mpi_comm.bcast(payload, root=0)
+
+    if mpi_comm.Get_rank() == 0:
+        stats = mpi_stats[call_name]
+        stats['calls'] += 1
+        stats['bcast_time'] += time.perf_counter() - tic
+        stats['bcast_bytes'] += len(payload)
+        return call_name, args, kwargs
+
+    return pickle.loads(payload)
+
+
+class BufferRef:
+    """Reference to an array in the buffer sent by gather_response().
+    """
+
+    __slots__ = ('offset', 'nbytes', 'dtype', 'shape')
+
+    def __init__(self, offset, nbytes, dtype, shape):
+        self.offset = offset
+        self.nbytes = nbytes
+        self.dtype = dtype
+        self.shape = shape
+
+
+def split_buffers(data, arrays):
+    """Replace numeric NumPy arrays in data by BufferRefs.
+
+    The arrays are appended to the given list together with their
+    BufferRef, which gives the aligned offset of the array behind the
+    previous one. Only lists of containers (see has_containers()) are
+    searched for arrays.
+
+    """
+
+    if isinstance(data, numpy.ndarray) and data.dtype.kind in 'biuf':
+        offset = 0
+        if len(arrays) > 0:
+            offset = arrays[-1][0].offset + arrays[-1][0].nbytes
+            offset += -offset % BUFFER_ALIGNMENT
+        ref = BufferRef(offset, data.nbytes, data.dtype.str, data.shape)
+        arrays.append((ref, data))
+        return ref
+    if isinstance(data, dict):
+        return {key: split_buffers(value, arrays) for key, value in data.items()}
+    if isinstance(data, list) and has_containers(data):
+        return [split_buffers(value, arrays) for value in data]
+    return data
+
+
+def join_buffers(data, buffer):
+    """Replace the BufferRefs in data by views into the buffer.
+    """
+
+    if isinstance(data, BufferRef):
+        view = buffer[data.offset:data.offset + data.nbytes]
+        return view.view(data.dtype).reshape(data.shape)
+    if isinstance(data, dict):
+        return {key: join_buffers(value, buffer) for key, value in data.items()}
+    if isinstance(data, list) and has_containers(data):
+        return [join_buffers(value, buffer) for value in data]
+    return data
+
+
+def pack_response(response):
+    """Pack a response into a pickled payload and a byte buffer with its
+    numeric NumPy arrays (see split_buffers()).
+    """
+
+    arrays = []
+    skeleton = split_buffers(response, arrays)
+    size = arrays[-1][0].offset + arrays[-1][0].nbytes if arrays else 0
+    buffer = numpy.empty(size, dtype=numpy.uint8)
+    for ref, array in arrays:
+        buffer[ref.offset:ref.offset + ref.nbytes] = \
+            numpy.ascontiguousarray(array).reshape(-1).view(numpy.uint8)
+    return pickle.dumps(skeleton, pickle.HIGHEST_PROTOCOL), buffer
+
+
+class WorkerFailure:
+    """Marker sent by a worker instead of the response of a failed call.
+    """
+
+    def __init__(self, rank, error):
+        self.rank = rank
+        self.message = str(error)
+
+    def __str__(self):
+        return f'process {self.rank}: {self.message}'
+
+
+def failed_anywhere(failed):
+    """Tell if a call failed on any process.
+
+    This is used for calls in MASTER_RESPONSE_CALLS, whose responses are
+    not gathered, so that failures on the workers are still reported by
+    the master.
+
+    """
+
+    from mpi4py import MPI
+
+    return mpi_comm.allreduce(failed, op=MPI.LOR)
+
+
+def gather_response(call_name, response):
+    """Gather the responses of all processes on the master.
+
+    The numeric NumPy arrays in the response of each process are copied
+    into a single byte buffer and sent with a single Gatherv, while the
+    rest of the response is pickled and sent with a gather. The master
+    response is used as it is. Returns the list of all responses on the
+    master and None on the workers.
+
+    """
+
+    from mpi4py import MPI
+
+    if mpi_comm.Get_rank() > 0:
+        # A worker that cannot pack its response must still take part in
+        # the gather, as the master would wait for it forever otherwise
+        try:
+            payload, buffer = pack_response(response)
+        except Exception as e:
+            log(call_name, 'cannot pack response', level=logging.ERROR, exc_info=True)
+            payload, buffer = pack_response(WorkerFailure(mpi_comm.Get_rank(), e))
+        mpi_comm.gather((payload, buffer.nbytes), root=0)
+        mpi_comm.Gatherv([buffer, MPI.BYTE], None, root=0)
+        return None
+
+    tic = time.perf_counter()
+    payloads = mpi_comm.gather((b'', 0), root=0)
+
+    sizes = [size for _, size in payloads]
+    displacements = numpy.cumsum([0] + sizes[:-1]).tolist()
+    recvbuf = numpy.empty(sum(sizes), dtype=numpy.uint8)
+    mpi_comm.Gatherv([numpy.empty(0, dtype=numpy.uint8), MPI.BYTE],
+                     [recvbuf, sizes, displacements, MPI.BYTE], root=0)
+
+    responses = [response]
+    for (payload, size), displacement in list(zip(payloads, displacements))[1:]:
+        responses.append(join_buffers(pickle.loads(payload),
+                                      recvbuf[displacement:displacement + size]))
+
+    stats = mpi_stats[call_name]
+    stats['gather_time'] += time.perf_counter() - tic
+    stats['gather_bytes'] += sum(len(payload) for payload, _ in payloads) + sum(sizes)
+
+    return responses
+
+
+@app.route('/health', methods=['GET'])
+@cross_origin()
+def route_health():
+    """ Route to check if the server is up. It is answered even while
+    a call is running.
+    """
+    progress = control_state.progress()
+    return jsonify({
+        'status': 'ok',
+        'busy': progress['call'] is not None,
+        'queued': main_queue.qsize(),
+    })
+
+
+@app.route('/progress', methods=['GET'])
+@cross_origin()
+def route_progress():
+    """ Route to get the running and the last finished call.
+    """
+    return jsonify(control_state.progress())
+
+
+@app.route('/kernel_status', methods=['GET'])
+@cross_origin()
+def route_kernel_status():
+    """ Route to get the kernel status returned by the last call to
+    GetKernelStatus, without calling NEST.
+    """
+    return jsonify(unpack_arrays(control_state.snapshot()))
+
+
+@app.route('/metrics', methods=['GET'])
+def route_metrics():
+    """ Route to get the metrics of the server in the Prometheus text
+    format.
+    """
+    return Response(metrics.exposition(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/sessions', methods=['GET'])
+@cross_origin()
+def route_sessions():
+    """ Route to get the sessions of /exec with their memory.
+    """
+    return jsonify(session_store.stats())
+
+
+@app.route('/stats', methods=['GET'])
+@cross_origin()
+def route_stats():
+    """ Route to get statistics of the caches of the server.
+    """
+    return jsonify({
+        'module_cache': module_cache.stats(),
+        'code_cache': code_cache.stats(),
+        'mpi': dict(mpi_stats),
+    })
+
+
+@app.route('/batch', methods=['POST'])
+@cross_origin()
+def route_batch():
+    """ Route to call several functions in NEST with a single request.
+    """
+    calls = get_batch(request)
+    log("route_batch", "calls=%s", calls)
+    response = on_main_thread(batch_client, "batch", calls, {})
+    return encode_response(response)
 
 
 @app.route('/exec', methods=['GET', 'POST'])
@@ -169,8 +592,8 @@ def route_exec():
     """
 
     args, kwargs = get_arguments(request)
-    response = do_call('exec', args, kwargs)
-    return jsonify(response)
+    response = on_main_thread(exec_client, 'exec', args, kwargs)
+    return encode_response(response)
 
 
 # --------------------------
@@ -181,6 +604,30 @@ nest_calls = dir(nest)
 nest_calls = list(filter(lambda x: not x.startswith('_'), nest_calls))
 nest_calls.sort()
 
+NestCall = collections.namedtuple('NestCall', ['call', 'node_args'])
+
+
+def get_nest_call(call_name, call=None):
+    """Get the PyNEST function and the positions of its arguments that
+    take a NodeCollection.
+    """
+    if call is None:
+        call = getattr(nest, call_name)
+    try:
+        parameters = list(inspect.signature(call).parameters.keys())
+    except (TypeError, ValueError):
+        parameters = []
+    node_args = frozenset(idx for idx, name in enumerate(parameters)
+                          if name in NODE_PARAMETERS)
+    return NestCall(call, node_args)
+
+
+# Dispatch table of all PyNEST functions, so that calls need no reflection.
+# Kernel attributes of the nest module are looked up statically, as
+# reading some of them fails before a simulation.
+nest_dispatch = {call_name: get_nest_call(call_name) for call_name in nest_calls
+                 if callable(inspect.getattr_static(nest, call_name, None))}
+
 
 @app.route('/api', methods=['GET'])
 @cross_origin()
@@ -195,11 +642,10 @@ def route_api():
 def route_api_call(call):
     """ Route to call function in NEST.
     """
-    print(f"\n{'='*40}\n", flush=True)
     args, kwargs = get_arguments(request)
-    log("route_api_call", f"call={call}, args={args}, kwargs={kwargs}")
-    response = api_client(call, args, kwargs)
-    return jsonify(response)
+    log("route_api_call", "call=%s, args=%s, kwargs=%s", call, args, kwargs)
+    response = on_main_thread(api_client, call, args, kwargs)
+    return encode_response(response)
 
 
 # ----------------------
@@ -220,26 +666,541 @@ class Capturing(list):
         sys.stdout = self._stdout
 
 
+class Shortened:
+    """ Lazily formatted, size-bounded representation of an object for
+    log messages.
+    """
+
+    reprs = reprlib.Repr()
+    reprs.maxlevel = 3
+    reprs.maxstring = reprs.maxother = LOG_MAX_LENGTH
+    reprs.maxdict = reprs.maxlist = reprs.maxtuple = reprs.maxset = 20
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __str__(self):
+        if isinstance(self.obj, str):
+            text = self.obj
+        else:
+            text = self.reprs.repr(self.obj)
+        if len(text) > LOG_MAX_LENGTH:
+            text = f'{text[:LOG_MAX_LENGTH]}...'
+        return text
+
+
+class RankFilter(logging.Filter):
+    """ Add the MPI rank and role of the process to log records.
+    """
+
+    def filter(self, record):
+        record.rank = 0 if mpi_comm is None else mpi_comm.Get_rank()
+        record.role = 'WORKER' if record.rank > 0 else 'MASTER'
+        if not hasattr(record, 'call_name'):
+            record.call_name = record.funcName
+        return True
+
+
+def setup_logger():
+    """ Set up the logger of the server, writing to stdout.
+    """
+    handler = logging.StreamHandler(sys.stdout)
+    handler.addFilter(RankFilter())
+    handler.setFormatter(logging.Formatter(
+        '==> %(role)s %(rank)d/%(created).7f (%(call_name)s): %(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+
+
+setup_logger()
+
+
+class ControlState:
+    """ State of the calls that the control routes report while the
+    main thread may be busy with a call. It is updated by do_call() and
+    never touches the NEST kernel.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.call = None
+        self.last_call = None
+        self.calls = 0
+        self.kernel_status = None
+        self.kernel_status_time = None
+
+    def begin(self, call_name, args, kwargs):
+        call = {'call': call_name, 'started': time.time()}
+        if call_name in ('Simulate', 'Run'):
+            call['t'] = kwargs.get('t', args[0] if len(args) > 0 else None)
+        if call_name == 'RunSteps':
+            steps = kwargs.get('steps', args[0] if len(args) > 0 else None)
+            step = kwargs.get('step', args[1] if len(args) > 1 else None)
+            if steps is not None and step is not None:
+                call['t'] = steps * step
+        if call_name == 'batch':
+            call['calls'] = [name for name, _, _ in args]
+        with self.lock:
+            if self.kernel_status is not None:
+                call['biological_time'] = self.kernel_status.get('biological_time')
+            self.call = call
+
+    def end(self, call_name, args, kwargs, response, failed=False):
+        with self.lock:
+            call = self.call
+            call['duration'] = time.time() - call['started']
+            call['failed'] = failed
+            self.last_call = call
+            self.call = None
+            self.calls += 1
+            if call_name == 'GetKernelStatus' and len(args) == 0 and \
+               'keys' not in kwargs and isinstance(response, dict):
+                self.kernel_status = response
+                self.kernel_status_time = time.time()
+
+    def progress(self):
+        with self.lock:
+            call = None if self.call is None else dict(self.call)
+            if call is not None:
+                call['elapsed'] = time.time() - call['started']
+            return {
+                'call': call,
+                'last_call': self.last_call,
+                'calls': self.calls,
+            }
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'time': self.kernel_status_time,
+                'kernel_status': self.kernel_status,
+            }
+
+
+class Metrics:
+    """ Counters and histograms of the server in the Prometheus text
+    format.
+
+    For each call, the number of calls and failures, a histogram of the
+    duration of the call in the server, and the time spent in the PyNEST
+    function or script on the master (local), in MPI communication and
+    in the rest of the server (argument conversion, serialization and
+    combination of responses) are recorded. For each route, the number
+    of requests and the bytes of requests and responses are recorded.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = collections.defaultdict(lambda: {
+            'count': 0,
+            'failed': 0,
+            'buckets': [0] * len(DURATION_BUCKETS),
+            'duration': 0.0,
+            'local': 0.0,
+            'mpi': 0.0,
+        })
+        self.routes = collections.defaultdict(lambda: {
+            'count': 0,
+            'request_bytes': 0,
+            'response_bytes': 0,
+        })
+
+    def observe_call(self, call_name, duration, local=0.0, mpi=0.0, failed=False):
+        with self.lock:
+            call = self.calls[call_name]
+            call['count'] += 1
+            call['failed'] += int(failed)
+            call['duration'] += duration
+            call['local'] += local
+            call['mpi'] += mpi
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    call['buckets'][index] += 1
+
+    def observe_request(self, route, request_bytes, response_bytes):
+        with self.lock:
+            stats = self.routes[route]
+            stats['count'] += 1
+            stats['request_bytes'] += request_bytes
+            stats['response_bytes'] += response_bytes
+
+    def exposition(self):
+        lines = []
+
+        def metric(name, kind, text, samples):
+            lines.append(f'# HELP nest_server_{name} {text}')
+            lines.append(f'# TYPE nest_server_{name} {kind}')
+            for labels, value in samples:
+                label_text = ','.join(f'{key}="{value}"' for key, value in labels)
+                if label_text:
+                    label_text = f'{{{label_text}}}'
+                lines.append(f'nest_server_{name}{label_text} {value}')
+
+        with self.lock:
+            calls = {name: dict(call, buckets=list(call['buckets']))
+                     for name, call in self.calls.items()}
+            routes = {route: dict(stats) for route, stats in self.routes.items()}
+
+        metric('calls_total', 'counter', 'Number of calls.',
+               [((('call', name),), call['count']) for name, call in calls.items()])
+        metric('call_failures_total', 'counter', 'Number of failed calls.',
+               [((('call', name),), call['failed']) for name, call in calls.items()])
+
+        lines.append('# HELP nest_server_call_duration_seconds Duration of calls in the server.')  # noqa
+        lines.append('# TYPE nest_server_call_duration_seconds histogram')
+        for name, call in calls.items():
+            for bound, count in zip(DURATION_BUCKETS, call['buckets']):
+                lines.append(f'nest_server_call_duration_seconds_bucket{{call="{name}",le="{bound}"}} {count}')  # noqa
+            lines.append(f'nest_server_call_duration_seconds_bucket{{call="{name}",le="+Inf"}} {call["count"]}')  # noqa
+            lines.append(f'nest_server_call_duration_seconds_sum{{call="{name}"}} {call["duration"]}')  # noqa
+            lines.append(f'nest_server_call_duration_seconds_count{{call="{name}"}} {call["count"]}')  # noqa
+
+        metric('call_local_seconds_total', 'counter',
+               'Time spent in the PyNEST function or script on the master.',
+               [((('call', name),), call['local']) for name, call in calls.items()])
+        metric('call_mpi_seconds_total', 'counter',
+               'Time spent in broadcast and gather of calls.',
+               [((('call', name),), call['mpi']) for name, call in calls.items()])
+        metric('call_server_seconds_total', 'counter',
+               'Time spent in the server outside of the call and MPI.',
+               [((('call', name),), max(0.0, call['duration'] - call['local'] - call['mpi']))
+                for name, call in calls.items()])
+
+        mpi = dict(mpi_stats)
+        metric('mpi_bcast_bytes_total', 'counter', 'Bytes sent in broadcasts of calls.',
+               [((('call', name),), stats['bcast_bytes']) for name, stats in mpi.items()])
+        metric('mpi_gather_bytes_total', 'counter', 'Bytes received in gathers of responses.',  # noqa
+               [((('call', name),), stats['gather_bytes']) for name, stats in mpi.items()])
+
+        metric('requests_total', 'counter', 'Number of requests.',
+               [((('route', route),), stats['count']) for route, stats in routes.items()])
+        metric('request_bytes_total', 'counter', 'Bytes of request bodies.',
+               [((('route', route),), stats['request_bytes'])
+                for route, stats in routes.items()])
+        metric('response_bytes_total', 'counter', 'Bytes of response bodies.',
+               [((('route', route),), stats['response_bytes'])
+                for route, stats in routes.items()])
+
+        code_stats = code_cache.stats()
+        metric('exec_compile_seconds_total', 'counter', 'Time spent compiling scripts.',
+               [((), code_stats['compile_time'])])
+        metric('exec_code_cache_hits_total', 'counter', 'Scripts found in the code cache.',
+               [((), code_stats['hits'])])
+        metric('exec_code_cache_misses_total', 'counter', 'Scripts that had to be compiled.',
+               [((), code_stats['misses'])])
+        module_stats = module_cache.stats()
+        metric('exec_module_cache_rebuilds_total', 'counter',
+               'Rebuilds of the namespace of scripts.', [((), module_stats['rebuilds'])])
+
+        sessions = session_store.stats()
+        metric('sessions', 'gauge', 'Number of open sessions of scripts.',
+               [((), len(sessions))])
+        metric('session_memory_bytes', 'gauge', 'Estimated memory of the objects in sessions.',  # noqa
+               [((('session', name),), session['memory']) for name, session in sessions.items()])
+
+        return '\n'.join(lines) + '\n'
+
+
+control_state = ControlState()
+metrics = Metrics()
+main_queue = queue.Queue()
+main_loop_running = False
+
+
+def on_main_thread(func, *args):
+    """ Run a function on the main thread and return its result.
+
+    While run_mpi_app() serves requests in several threads, all calls
+    that touch the NEST kernel are executed one after the other by the
+    main thread. Otherwise, the function is called directly.
+    """
+    if not main_loop_running or threading.current_thread() is threading.main_thread():
+        return func(*args)
+    future = concurrent.futures.Future()
+    main_queue.put((future, func, args))
+    return future.result()
+
+
 def clean_code(source):
     codes = source.split('\n')
     code_cleaned = filter(lambda code: not (code.startswith('import') or code.startswith('from')), codes)  # noqa
     return '\n'.join(code_cleaned)
 
 
+class CodeCache:
+    """ LRU cache of compiled scripts.
+
+    Scripts are compiled only when they are executed for the first
+    time. The compiled code is looked up by a hash of the source and
+    the restriction mode. At most NEST_SERVER_CODE_CACHE_SIZE scripts
+    are kept, evicting the least recently used ones.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.codes = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.compile_time = 0.0
+
+    def get(self, source, restriction_off):
+        """ Get the compiled code of the given script.
+        """
+        key = (hashlib.sha1(source.encode('utf-8')).hexdigest(), restriction_off)
+        code = self.codes.get(key)
+        if code is not None:
+            self.codes.move_to_end(key)
+            self.hits += 1
+            return code
+
+        tic = time.perf_counter()
+        source_cleaned = clean_code(source)
+        if restriction_off:
+            code = compile(source_cleaned, '<inline>', 'exec')
+        else:
+            code = RestrictedPython.compile_restricted(source_cleaned, '<inline>', 'exec')  # noqa
+        self.compile_time += time.perf_counter() - tic
+        self.misses += 1
+
+        if self.size > 0:
+            self.codes[key] = code
+            if len(self.codes) > self.size:
+                self.codes.popitem(last=False)
+        return code
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else None,
+            'size': len(self.codes),
+            'max_size': self.size,
+            'compile_time': self.compile_time,
+        }
+
+
+code_cache = CodeCache(CODE_CACHE_SIZE)
+
+
+class SessionStore:
+    """ Named namespaces of scripts that are kept between calls.
+
+    A script executed with a session name runs in the namespace of that
+    session, so that it can use the objects created by the earlier
+    scripts of the session. Sessions are opened by their first script
+    on all processes. They are closed with CloseSession, by ResetKernel,
+    which invalidates the nodes their objects refer to, or when they
+    were not used for their lifetime in seconds, which the master checks
+    before each script (see exec_client()). At most
+    NEST_SERVER_MAX_SESSIONS sessions can be open. The memory of the
+    objects in a session is estimated after each of its scripts (see
+    namespace_size()).
+    """
+
+    def __init__(self, max_sessions, lifetime):
+        self.max_sessions = max_sessions
+        self.lifetime = lifetime
+        self.lock = threading.Lock()
+        self.sessions = {}
+
+    def open(self, name, lifetime=None):
+        """ Get the namespace of a session, opening it if needed.
+        """
+        with self.lock:
+            session = self.sessions.get(name)
+            if session is None:
+                if len(self.sessions) >= self.max_sessions:
+                    msg = f'Cannot open session "{name}", {self.max_sessions} sessions are open.'
+                    raise Exception(msg)
+                now = time.time()
+                session = self.sessions[name] = {
+                    'namespace': {},
+                    'created': now,
+                    'last_used': now,
+                    'lifetime': self.lifetime,
+                    'calls': 0,
+                    'memory': 0,
+                }
+            if lifetime is not None:
+                session['lifetime'] = float(lifetime)
+            return session['namespace']
+
+    def used(self, name):
+        """ Account a script of a session.
+        """
+        with self.lock:
+            session = self.sessions[name]
+            session['last_used'] = time.time()
+            session['calls'] += 1
+            session['memory'] = namespace_size(session['namespace'])
+
+    def close(self, name):
+        """ Close a session and tell if it was open.
+        """
+        with self.lock:
+            return self.sessions.pop(name, None) is not None
+
+    def clear(self):
+        """ Close all sessions.
+        """
+        with self.lock:
+            self.sessions.clear()
+
+    def expired(self):
+        """ Get the names of the sessions that outlived their lifetime.
+        """
+        now = time.time()
+        with self.lock:
+            return [name for name, session in self.sessions.items()
+                    if 0 < session['lifetime'] < now - session['last_used']]
+
+    def stats(self):
+        with self.lock:
+            return {
+                name: {
+                    'created': session['created'],
+                    'last_used': session['last_used'],
+                    'lifetime': session['lifetime'],
+                    'calls': session['calls'],
+                    'variables': len(session['namespace']),
+                    'memory': session['memory'],
+                }
+                for name, session in self.sessions.items()
+            }
+
+
+session_store = SessionStore(MAX_SESSIONS, SESSION_LIFETIME)
+
+
+class Timeline:
+    """ Parameter updates of nodes, scheduled at simulation times.
+
+    The timeline exists on all processes. Its updates are applied by
+    simulate() when the simulation reaches their time, in the order of
+    their times and, for equal times, of scheduling.
+    """
+
+    def __init__(self):
+        self.updates = []  # sorted list of (time, number, nodes, params)
+        self.scheduled = 0
+        self.applied = 0
+
+    def __len__(self):
+        return len(self.updates)
+
+    def add(self, time, nodes, params):
+        bisect.insort(self.updates, (float(time), self.scheduled, nodes, params))
+        self.scheduled += 1
+
+    def next_time(self):
+        return self.updates[0][0] if self.updates else None
+
+    def apply(self, time):
+        """ Apply all updates up to the given time.
+        """
+        while self.updates and self.updates[0][0] <= time:
+            _, _, nodes, params = self.updates.pop(0)
+            nest.SetStatus(nodes, params)
+            self.applied += 1
+
+    def clear(self):
+        self.updates = []
+
+
+timeline = Timeline()
+
+
+def namespace_size(namespace):
+    """ Estimate the memory of the objects in a namespace in bytes.
+
+    The objects and the items of containers are counted, but not the
+    objects these refer to in turn.
+    """
+    size = 0
+    for value in namespace.values():
+        size += sys.getsizeof(value)
+        if isinstance(value, dict):
+            value = list(value.keys()) + list(value.values())
+        if isinstance(value, (list, tuple, set)):
+            size += sum(sys.getsizeof(item) for item in value)
+    return size
+
+
+def encode_response(data):
+    """ Encode the response data in the format accepted by the client.
+
+    JSON is used by default. Clients that accept MSGPACK_MIMETYPE get a
+    MessagePack response instead, in which numeric arrays are sent as
+    raw little-endian buffers (see pack_arrays()).
+    """
+    mimetypes = [JSON_MIMETYPE]
+    if msgpack is not None:
+        mimetypes.append(MSGPACK_MIMETYPE)
+    mimetype = request.accept_mimetypes.best_match(mimetypes, default=JSON_MIMETYPE)
+
+    if mimetype == MSGPACK_MIMETYPE:
+        payload = msgpack.packb(pack_arrays(data), default=pack_ndarray,
+                                use_bin_type=True)
+        return Response(payload, mimetype=MSGPACK_MIMETYPE)
+    return jsonify(unpack_arrays(data))
+
+
+def pack_arrays(data):
+    """ Convert lists of numbers in the data to NumPy arrays.
+    """
+    if isinstance(data, dict):
+        return {key: pack_arrays(value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        if len(data) > 0 and type(data[0]) in (int, float):
+            try:
+                array = numpy.asarray(data)
+                if array.dtype.kind in 'iuf':
+                    return array
+            except (OverflowError, ValueError):
+                pass
+        return [pack_arrays(value) for value in data]
+    return data
+
+
+def unpack_arrays(data):
+    """ Convert NumPy arrays in the data to lists for JSON encoding.
+
+    Only lists of containers (see has_containers()) are searched for
+    arrays, lists of scalars are returned as they are.
+    """
+    if isinstance(data, numpy.ndarray):
+        return data.tolist()
+    if isinstance(data, dict):
+        return {key: unpack_arrays(value) for key, value in data.items()}
+    if isinstance(data, list) and has_containers(data):
+        return [unpack_arrays(value) for value in data]
+    return data
+
+
+def pack_ndarray(obj):
+    """ Pack objects MessagePack does not know, in particular NumPy arrays.
+
+    A numeric array is packed as extension type NDARRAY_EXT_TYPE, whose
+    data is a packed list of the dtype string and the shape, followed
+    by the raw little-endian buffer of the array.
+    """
+    if isinstance(obj, numpy.ndarray) and obj.dtype.kind in 'biuf':
+        array = numpy.ascontiguousarray(obj, dtype=obj.dtype.newbyteorder('<'))
+        header = msgpack.packb([array.dtype.str, list(array.shape)])
+        return msgpack.ExtType(NDARRAY_EXT_TYPE, header + array.tobytes())
+    if isinstance(obj, numpy.generic):
+        return obj.item()
+    return nest.serializable(obj)
+
+
 def get_arguments(request):
     """ Get arguments from the request.
     """
     args, kwargs = [], {}
     if request.is_json:
-        json = request.get_json()
-        if isinstance(json, str) and len(json) > 0:
-            args = [json]
-        elif isinstance(json, list):
-            args = json
-        elif isinstance(json, dict):
-            kwargs = json
-            if 'args' in kwargs:
-                args = kwargs.pop('args')
+        args, kwargs = split_arguments(request.get_json())
     elif len(request.form) > 0:
         if 'args' in request.form:
             args = request.form.getlist('args')
@@ -253,25 +1214,158 @@ def get_arguments(request):
     return list(args), kwargs
 
 
+def split_arguments(json):
+    """ Split decoded JSON data into args and kwargs.
+    """
+    args, kwargs = [], {}
+    if isinstance(json, str) and len(json) > 0:
+        args = [json]
+    elif isinstance(json, list):
+        args = json
+    elif isinstance(json, dict):
+        kwargs = json
+        if 'args' in kwargs:
+            args = kwargs.pop('args')
+    return list(args), kwargs
+
+
+def get_batch(request):
+    """ Get the calls of a batch from the request.
+
+    The request data must be a JSON list, in which each item is an
+    object with the name of the function in "call", its args in "args"
+    and its kwargs in all other fields.
+    """
+    json = request.get_json(silent=True)
+    if not isinstance(json, list) or \
+       not all(isinstance(item, dict) and 'call' in item for item in json):
+        msg = 'A batch must be a list of objects with a "call" field.'
+        abort(Response(msg, EXCEPTION_ERROR_STATUS))
+    calls = []
+    for item in json:
+        kwargs = dict(item)
+        call_name = kwargs.pop('call')
+        args, kwargs = split_arguments(kwargs)
+        calls.append((call_name, args, kwargs))
+    return calls
+
+
+class ModuleCache:
+    """ Cache of the namespace in which scripts are executed.
+
+    The namespace consists of the globals of this module, the Python
+    modules in NEST_SERVER_MODULES and the user modules and packages in
+    USER_MODULES_DIR. It is built on the first call and only rebuilt if
+    a Python file of a user module was added, removed or modified. This
+    is checked at most every NEST_SERVER_MODULES_CHECK_INTERVAL seconds.
+    Modified user modules are reloaded on rebuild.
+    """
+
+    def __init__(self, path, check_interval):
+        self.path = path
+        self.check_interval = check_interval
+        self.namespace = None
+        self.signatures = {}
+        self.checked = 0.0
+        self.hits = 0
+        self.rebuilds = 0
+
+    def get_signatures(self):
+        """ Get the names of the user modules and the modification
+        times of their Python files.
+        """
+        signatures = {}
+        for fname in glob.glob(os.path.join(self.path, '*.py')):
+            signatures[os.path.basename(fname)[:-3]] = self.get_mtimes([fname])
+        for dirname in glob.glob(os.path.join(self.path, '*', '')):
+            if os.path.isfile(os.path.join(dirname, '__init__.py')):
+                fnames = [os.path.join(root, fname)
+                          for root, _, files in os.walk(dirname)
+                          for fname in files if fname.endswith('.py')]
+                name = os.path.basename(os.path.dirname(dirname))
+                signatures[name] = self.get_mtimes(sorted(fnames))
+        return signatures
+
+    @staticmethod
+    def get_mtimes(fnames):
+        mtimes = []
+        for fname in fnames:
+            try:
+                mtimes.append((fname, os.stat(fname).st_mtime_ns))
+            except FileNotFoundError:
+                pass
+        return tuple(mtimes)
+
+    def build(self, signatures):
+        namespace = globals().copy()
+        namespace.update((module, importlib.import_module(module))
+                         for module in MODULES)
+
+        importlib.invalidate_caches()
+        for name, signature in signatures.items():
+            module = sys.modules.get(name)
+            if module is None:
+                module = importlib.import_module(name)
+            elif self.signatures.get(name, signature) != signature:
+                module = importlib.reload(module)
+            namespace[name] = module
+
+        self.namespace = namespace
+        self.signatures = signatures
+        self.rebuilds += 1
+
+    def get(self):
+        """ Get the namespace, rebuilding it if user modules changed.
+        """
+        now = time.time()
+        if self.namespace is None or now - self.checked >= self.check_interval:
+            self.checked = now
+            signatures = self.get_signatures()
+            if self.namespace is None or signatures != self.signatures:
+                self.build(signatures)
+                return self.namespace
+        self.hits += 1
+        return self.namespace
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'rebuilds': self.rebuilds,
+            'user_modules': sorted(self.signatures),
+        }
+
+
+module_cache = ModuleCache(USER_MODULES_DIR, MODULES_CHECK_INTERVAL)
+
+
 def get_globals():
     """ Get globals for exec function.
     """
-    copied_globals = globals().copy()
+    return module_cache.get().copy()
 
-    # Add python modules to copied globals
-    modlist = [(module, importlib.import_module(module)) for module in MODULES]
-    modules = dict(modlist)
-    copied_globals.update(modules)
 
-    # Add user modules from /opt/data to copied globals
-    user_modules_list_dirs = [module[10:-1] for module in glob.glob('/opt/data/*/') \
-                              if os.path.isfile(module + '__init__.py') ]
-    user_modules_list_files = [module[10:-3] for module in glob.glob('/opt/data/*.py')]
-    user_modules = dict([(module, importlib.import_module(module)) \
-                         for module in user_modules_list_files + user_modules_list_dirs])
-    copied_globals.update(user_modules)
+def has_containers(data):
+    """ Tell if the items of a list are containers, judging by the first
+    item that is not None. This avoids looking at every item of long
+    lists of numbers.
+    """
+    for item in data:
+        if item is not None:
+            return isinstance(item, (dict, list, tuple, numpy.ndarray, BufferRef))
+    return False
 
-    return copied_globals
+
+def serializable(data):
+    """ Make data serializable like nest.serializable(), but keep numeric
+    NumPy arrays, so they can be sent as buffers.
+    """
+    if isinstance(data, numpy.ndarray) and data.dtype.kind in 'biuf':
+        return data
+    if isinstance(data, dict):
+        return {key: serializable(value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)) and has_containers(data):
+        return [serializable(value) for value in data]
+    return nest.serializable(data)
 
 
 def get_or_error(func):
@@ -281,8 +1375,7 @@ def get_or_error(func):
         try:
             return func(call, args, kwargs)
         except Exception as e:
-            for line in traceback.format_exception(*sys.exc_info()):
-                print(line, flush=True)
+            log(call, 'exception in call', level=logging.ERROR, exc_info=True)
             abort(Response(str(e), EXCEPTION_ERROR_STATUS))
     return func_wrapper
 
@@ -329,16 +1422,401 @@ def nestify(call_name, args, kwargs):
     """Get the NEST API call and convert arguments if neccessary.
     """
 
-    call = getattr(nest, call_name)
-    objectnames = ['nodes', 'source', 'target', 'pre', 'post']
-    paramKeys = list(inspect.signature(call).parameters.keys())
-    args = [nest.NodeCollection(arg) if paramKeys[idx] in objectnames
-            else arg for (idx, arg) in enumerate(args)]
-    for (key, value) in kwargs.items():
-        if key in objectnames:
-            kwargs[key] = nest.NodeCollection(value)
+    nest_call = nest_dispatch.get(call_name)
+    if nest_call is None:
+        nest_call = get_nest_call(call_name)
+    if nest_call.node_args:
+        args = [to_node_collection(arg) if idx in nest_call.node_args
+                else arg for (idx, arg) in enumerate(args)]
+    for key in NODE_PARAMETERS:
+        if key in kwargs:
+            kwargs[key] = to_node_collection(kwargs[key])
+
+    return nest_call.call, args, kwargs
+
+
+def to_node_collection(value):
+    """Convert a list of node IDs to a NodeCollection.
+
+    The list is converted to a NumPy array first, which PyNEST passes to
+    the kernel as a single vector instead of item by item.
+    """
+
+    if isinstance(value, (list, tuple)):
+        try:
+            value = numpy.asarray(value, dtype=numpy.int64)
+        except (TypeError, ValueError):
+            pass
+    elif isinstance(value, nest.NodeCollection):
+        return value
+    return nest.NodeCollection(value)
+
+
+def get_events(nodes, since=None, clear=False, client=None):
+    """Get the events recorders recorded since the last read of a client.
+
+    Each process keeps a cursor per client and recorder, which holds the
+    biological time of the last read and the number of local events
+    read up to then. If since is the cursor returned by the last read,
+    only the events after that number are returned, so that the size of
+    the response grows with the new events instead of all events. For
+    an unknown cursor, the events are filtered by time instead, and
+    since=None returns all events.
+
+    If clear is True, the events of the recorders are deleted on all
+    processes after the read. This also resets the cursors of other
+    clients on the recorders to the filter by time.
+
+    The response is a status dictionary per recorder, which is combined
+    like the response of GetStatus (see merge_dicts()), with the new
+    cursor in the field "cursor".
+
+    """
+
+    cursor = nest.GetKernelStatus('biological_time')
+    response = []
+    for global_id, record_to, events in nest.GetStatus(nodes, ('global_id', 'record_to', 'events')):  # noqa
+        if record_to != 'memory':
+            msg = f'Cannot get events of recorder {global_id} recording to "{record_to}".'
+            raise Exception(msg)
+
+        times = numpy.asarray(events['times'])
+        last_cursor, offset = event_cursors.get((client, global_id), (None, 0))
+        if since is None:
+            index = slice(0, None)
+        elif since == last_cursor and offset <= len(times):
+            index = slice(offset, None)
+        else:
+            index = times > since
+        new_events = {key: numpy.asarray(value)[index] for key, value in events.items()}
+
+        if clear:
+            for key in [key for key in event_cursors if key[1] == global_id]:
+                del event_cursors[key]
+        event_cursors[(client, global_id)] = (cursor, 0 if clear else len(times))
+
+        response.append({
+            'element_type': 'recorder',
+            'record_to': 'memory',
+            'global_id': global_id,
+            'cursor': cursor,
+            'n_events': len(new_events['times']),
+            'events': new_events,
+        })
+
+    if clear:
+        nest.SetStatus(nodes, {'n_events': 0})
+
+    return response
+
+
+def reduce_quantity(nodes, quantity, op='mean', start=None, stop=None, bins=10,
+                    limits=None):
+    """Reduce a quantity of nodes on all processes to a number.
+
+    For recorders, the quantity is a field of their events, e.g. "times"
+    or "V_m", of which only the events with start <= times < stop are
+    taken. For all other nodes, it is a parameter or state variable like
+    "V_m" of the local nodes. Each process reduces its own values, and
+    the partial results are summed up on the master with a single MPI
+    Reduce, so that no values are sent to the master.
+
+    op is one of REDUCE_OPS. The histogram has the given number of bins
+    between limits, which is a pair of lower and upper bound. Without
+    limits, the bounds are the time window for event times and the
+    minimum and maximum of all values otherwise.
+
+    Returns the count, sum or mean, or a dictionary with the counts and
+    edges of the histogram on the master and None on the workers. The
+    mean of no values is None.
+
+    """
+
+    if op not in REDUCE_OPS:
+        raise ValueError(f'Unknown operation "{op}", use one of {", ".join(REDUCE_OPS)}.')
+
+    if mpi_comm is not None:
+        from mpi4py import MPI
+
+    # A failure on one process must not leave the others waiting in
+    # the reduction, so failures are reduced first
+    error = None
+    try:
+        values = local_values(nodes, quantity, start, stop)
+    except Exception as e:
+        values, error = numpy.empty(0), e
+    if mpi_comm is not None and mpi_comm.allreduce(error is not None, op=MPI.LOR):
+        raise error or Exception('Reduce failed on another process.')
+    if error is not None:
+        raise error
+
+    partial = numpy.zeros(2 + (bins if op == 'histogram' else 0))
+    partial[0] = len(values)
+    partial[1] = values.sum()
+    if op == 'histogram':
+        if limits is None and quantity == 'times' and None not in (start, stop):
+            limits = (start, stop)
+        if limits is None:
+            limits = (values.min(initial=numpy.inf), values.max(initial=-numpy.inf))
+            if mpi_comm is not None:
+                limits = (mpi_comm.allreduce(limits[0], op=MPI.MIN),
+                          mpi_comm.allreduce(limits[1], op=MPI.MAX))
+            if not numpy.isfinite(limits).all():
+                limits = None
+        partial[2:], edges = numpy.histogram(values, bins, range=limits)
+
+    total = partial
+    if mpi_comm is not None:
+        total = numpy.empty_like(partial) if mpi_comm.Get_rank() == 0 else None
+        mpi_comm.Reduce([partial, MPI.DOUBLE],
+                        None if total is None else [total, MPI.DOUBLE],
+                        op=MPI.SUM, root=0)
+        if mpi_comm.Get_rank() > 0:
+            return None
+
+    if op == 'count':
+        return int(total[0])
+    if op == 'sum':
+        return float(total[1])
+    if op == 'mean':
+        return float(total[1] / total[0]) if total[0] else None
+    return {'counts': total[2:].astype(numpy.int64), 'edges': edges}
+
+
+def local_values(nodes, quantity, start=None, stop=None):
+    """Get the values of a quantity on the local process as one array.
+
+    See reduce_quantity() for the meaning of the arguments.
+    """
+
+    if len(nodes) == 0:
+        return numpy.empty(0)
+
+    # Recorders exist on all processes, other nodes only on one
+    if nest.GetStatus(nodes[0], 'element_type')[0] != 'recorder':
+        local_nodes = nest.GetLocalNodeCollection(nodes)
+        if len(local_nodes) == 0:
+            return numpy.empty(0)
+        return numpy.asarray(nest.GetStatus(local_nodes, quantity), dtype=float)
+
+    values = []
+    for events in nest.GetStatus(nodes, 'events'):
+        times = numpy.asarray(events['times'])
+        mask = numpy.ones(len(times), dtype=bool)
+        if start is not None:
+            mask &= times >= start
+        if stop is not None:
+            mask &= times < stop
+        values.append(numpy.asarray(events[quantity], dtype=float)[mask])
+    return numpy.concatenate(values)
+
+
+def get_local_status(nodes, keys=None, output=''):
+    """Get the status of the local nodes for GetStatus with MPI.
+
+    Instead of a status for every node, in which the nodes of other
+    processes are placeholders, only the status of the local nodes is
+    returned, tagged with their positions in nodes. If the first and
+    the last node are neurons, only the nodes of GetLocalNodeCollection()
+    are queried, and only for the given keys. Devices exist on all
+    processes and are merged on the master, so if nodes contain devices,
+    the status of all nodes is queried and devices keep the fields needed
+    for merging (see combine_status()). As devices are local on every
+    process, all processes find the devices among their local nodes and
+    take this path alike.
+
+    """
+
+    if output:
+        raise ValueError('GetStatus cannot format the output with MPI.')
+
+    neurons, devices = ([], []), ([], [])
+    if len(nodes) > 0:
+        ends = nest.GetStatus(nodes[0], 'element_type') + nest.GetStatus(nodes[-1], 'element_type')
+        has_devices = 'recorder' in ends or 'stimulator' in ends
+        if has_devices or not get_neuron_status(nodes, keys, neurons):
+            get_device_status(nodes, keys, neurons, devices)
+
+    values = neurons[1]
+    if isinstance(keys, str) and values and not has_containers(values):
+        array = numpy.asarray(values)
+        if array.dtype.kind in 'biuf':
+            values = array
+
+    return {
+        'n_nodes': len(nodes),
+        'keys': keys,
+        'neurons': (numpy.asarray(neurons[0], dtype=numpy.int64), values),
+        'devices': (numpy.asarray(devices[0], dtype=numpy.int64), devices[1]),
+    }
+
+
+def get_neuron_status(nodes, keys, neurons):
+    """Append the positions and the status of the local neurons in nodes.
+
+    Returns False without appending anything if the local nodes contain
+    a device, and True otherwise.
+
+    """
+
+    local_nodes = nest.GetLocalNodeCollection(nodes)
+    if len(local_nodes) == 0:
+        return True
+
+    positions = {node_id: index for index, node_id in enumerate(nodes.tolist())}
+
+    if keys is None:
+        fields = None
+    else:
+        fields = ['element_type'] + ([keys] if isinstance(keys, str) else list(keys))
+    indices, values = [], []
+    for node_id, status in zip(local_nodes.tolist(), nest.GetStatus(local_nodes, fields)):
+        element_type = status['element_type'] if keys is None else status[0]
+        if element_type in ('recorder', 'stimulator'):
+            return False
+        indices.append(positions[node_id])
+        if keys is None:
+            values.append(status)
+        elif isinstance(keys, str):
+            values.append(status[1])
+        else:
+            values.append(list(status[1:]))
+
+    neurons[0].extend(indices)
+    neurons[1].extend(values)
+    return True
+
+
+def get_device_status(nodes, keys, neurons, devices):
+    """Append the positions and the status of the local nodes in nodes,
+    which contain devices.
+    """
+
+    for index, status in enumerate(nest.GetStatus(nodes)):
+        if not status['local']:
+            continue
+        if status['element_type'] in ('recorder', 'stimulator'):
+            if keys is not None:
+                fields = set(MERGE_FIELDS).union([keys] if isinstance(keys, str) else keys)
+                status = {key: value for key, value in status.items() if key in fields}
+            devices[0].append(index)
+            devices[1].append(status)
+        else:
+            neurons[0].append(index)
+            neurons[1].append(project_status(status, keys))
+
+
+def project_status(status, keys):
+    """Reduce a status dictionary to the given keys like GetStatus.
+    """
+
+    if keys is None:
+        return status
+    if isinstance(keys, str):
+        return status[keys]
+    return [status[key] for key in keys]
+
+
+def schedule_updates(updates, clear=False):
+    """Schedule parameter updates of nodes at simulation times.
+
+    Each update is a dictionary with the simulation time in ms in
+    "time", the node IDs in "nodes" and either the parameters to set in
+    "params" or a single parameter in "parameter" and its "value". The
+    updates are applied by Simulate and RunSteps when the simulation
+    reaches their time, updates for past times at the start of the next
+    simulation. If clear is True, the updates scheduled before are
+    dropped. Returns the number of scheduled updates.
+
+    """
+
+    if clear:
+        timeline.clear()
+    for update in updates:
+        params = update.get('params')
+        if params is None:
+            params = {update['parameter']: update['value']}
+        timeline.add(update['time'], to_node_collection(update['nodes']), params)
+    return len(timeline)
+
+
+def simulate(t):
+    """Simulate for t ms, applying the updates of the timeline.
+
+    The simulation is split at the times of the updates into segments,
+    so that the updates take effect without leaving the server. Each
+    segment is simulated with its own Simulate instead of a single
+    Prepare with several Run calls, so that the updates act exactly
+    like SetStatus between two Simulate calls, also with NEST versions
+    whose devices only calibrate their parameters in Prepare. Times are
+    rounded to the resolution.
+
+    """
+
+    resolution = nest.GetKernelStatus('resolution')
+    step = round(nest.GetKernelStatus('biological_time') / resolution)
+    end = step + round(t / resolution)
+
+    while True:
+        timeline.apply((step + 0.5) * resolution)
+        if step >= end:
+            break
+        next_time = timeline.next_time()
+        stop = end
+        if next_time is not None:
+            stop = min(end, max(step + 1, round(next_time / resolution)))
+        nest.Simulate((stop - step) * resolution)
+        step = stop
+
+
+def run_steps(steps, step):
+    """Simulate a number of steps of the given length in ms.
+
+    The updates of the timeline are applied on the way (see
+    simulate()), so that a client only has to contact the server after
+    all steps. Returns the biological time and the numbers of updates
+    applied and still scheduled.
+
+    """
+
+    applied = timeline.applied
+    simulate(steps * step)
+    return {
+        'biological_time': nest.GetKernelStatus('biological_time'),
+        'applied_updates': timeline.applied - applied,
+        'scheduled_updates': len(timeline),
+    }
+
+
+# Calls that are replaced by a version for MPI on all processes
+mpi_calls = {
+    'GetStatus': get_local_status,
+}
+
+
+def close_session(name):
+    """Close a session of scripts on all processes.
+
+    name is the name of the session or a list of names. Returns the
+    number of sessions that were open.
+
+    """
+
+    names = [name] if isinstance(name, str) else name
+    return sum(session_store.close(name) for name in names)
+
 
-    return call, args, kwargs
+# Calls that are implemented by the server instead of PyNEST
+server_calls = {
+    'CloseSession': close_session,
+    'GetEvents': get_events,
+    'Reduce': reduce_quantity,
+    'RunSteps': run_steps,
+    'ScheduleUpdates': schedule_updates,
+}
+nest_dispatch.update({call_name: get_nest_call(call_name, call)
+                      for call_name, call in server_calls.items()})
+nest_calls = sorted(nest_calls + list(server_calls))
 
 
 @get_or_error
@@ -346,7 +1824,10 @@ def api_client(call_name, args, kwargs):
     """ API Client to call function in NEST.
     """
 
-    call = getattr(nest, call_name)
+    if call_name in nest_dispatch:
+        call = nest_dispatch[call_name].call
+    else:
+        call = getattr(nest, call_name)
 
     if callable(call):
         if 'inspect' in kwargs:
@@ -361,6 +1842,38 @@ def api_client(call_name, args, kwargs):
     return response
 
 
+def close_expired_sessions(call_name):
+    """ Close the sessions of /exec that expired (see SessionStore).
+    """
+
+    expired = session_store.expired()
+    if expired:
+        log(call_name, 'closing expired sessions %s', expired, level=logging.INFO)
+        do_call('CloseSession', [expired], {})
+
+
+def exec_client(call_name, args, kwargs):
+    """ Exec Client to execute a script, closing expired sessions first.
+    """
+
+    close_expired_sessions(call_name)
+    return do_call(call_name, args, kwargs)
+
+
+@get_or_error
+def batch_client(call_name, args, kwargs):
+    """ Batch Client to call several functions in NEST.
+    """
+
+    for name, _, _ in args:
+        if name != 'exec' and name not in nest_dispatch:
+            raise ValueError(f'Cannot call "{name}" in a batch.')
+
+    if any(name == 'exec' for name, _, _ in args):
+        close_expired_sessions(call_name)
+    return do_call(call_name, args, kwargs)
+
+
 def set_mpi_comm(comm):
     global mpi_comm
     mpi_comm = comm
@@ -368,9 +1881,71 @@ def set_mpi_comm(comm):
 
 def run_mpi_app(host="127.0.0.1", port=5000):
     # NEST crashes with a segmentation fault if the number of threads
-    # is changed from the outside. Calling run() with threaded=False
-    # prevents Flask from performing such changes.
-    app.run(host=host, port=port, threaded=False)
+    # is changed from the outside. Flask therefore serves requests in
+    # threads, but all calls that touch NEST are executed by the main
+    # thread (see on_main_thread()). Control routes like /health and
+    # /progress are answered by the request threads directly.
+    global main_loop_running
+
+    server = threading.Thread(
+        target=app.run, name='flask', daemon=True,
+        kwargs=dict(host=host, port=port, threaded=True, use_reloader=False),
+    )
+    server.start()
+    main_loop_running = True
+
+    while server.is_alive():
+        try:
+            future, func, args = main_queue.get(timeout=1.0)
+        except queue.Empty:
+            continue
+        if future.set_running_or_notify_cancel():
+            try:
+                future.set_result(func(*args))
+            except Exception as e:
+                future.set_exception(e)
+
+
+def run_mpi_worker():
+    """Execute the calls broadcast by the master until the process ends.
+
+    This is the counterpart of do_call() on the workers (i.e., all tasks
+    with a rank other than 0) in a distributed scenario.
+
+    """
+
+    assert mpi_comm is not None and mpi_comm.Get_rank() > 0
+
+    while True:
+        log("spinwait", "waiting for call bcast")
+        call_name, args, kwargs = bcast_call()
+        log(call_name, "received call bcast, args=%s, kwargs=%s", args, kwargs)
+
+        # Errors are reported by the master. The worker still takes part
+        # in the gather to keep the communication with the master in sync.
+        try:
+            response = serializable(local_call(call_name, args, kwargs))
+        except Exception as e:
+            log(call_name, "exception in call", level=logging.ERROR, exc_info=True)
+            response = WorkerFailure(mpi_comm.Get_rank(), e)
+
+        if needs_gather(call_name, args):
+            log(call_name, "sending response gather")
+            gather_response(call_name, response)
+        else:
+            failed_anywhere(isinstance(response, WorkerFailure))
+
+
+def combine_batch(calls, response):
+    """Combine the responses of a batch from different MPI processes.
+
+    The responses of each call of the batch are combined separately
+    with combine().
+
+    """
+
+    return [combine(call_name, [process_response[index] for process_response in response])
+            for index, (call_name, _, _) in enumerate(calls)]
 
 
 def combine(call_name, response):
@@ -397,6 +1972,9 @@ def combine(call_name, response):
       * if the response list contains only a single actual response and
         None otherwise, the combined response will be that one actual
         response
+      * for calls to GetStatus, each process only sends the status of
+        its local nodes (see get_local_status()), which are put back in
+        the order of the requested nodes (see combine_status())
       * for calls to GetStatus on recording devices, the combined
         response will be a merged dictionary in the sense that all
         fields that contain a single value in the individual responsed
@@ -418,15 +1996,22 @@ def combine(call_name, response):
         return None
 
     # return the master response if all responses are known to be the same
-    if call_name in ('exec', 'Create', 'GetDefaults', 'GetKernelStatus',
-                     'SetKernelStatus', 'SetStatus'):
+    if call_name in MASTER_RESPONSE_CALLS:
         return response[0]
 
+    # reassemble the status of the local nodes of all processes
+    if call_name == 'GetStatus':
+        return combine_status(response)
+
     # return a single response if there is only one which is not None
     filtered_response = list(filter(lambda x: x is not None, response))
     if len(filtered_response) == 1:
         return filtered_response[0]
 
+    # return a single array if the response only consists of arrays
+    if all(isinstance(v, numpy.ndarray) for v in response):
+        return numpy.concatenate(response)
+
     # return a single merged dictionary if there are many of them
     if all(type(v[0]) is dict for v in response):
         return merge_dicts(response)
@@ -435,11 +2020,45 @@ def combine(call_name, response):
     if all(type(v) is list for v in response):
         return [item for lst in response for item in lst]
 
-    log("combine()", f"ERROR: cannot combine response={response}")
+    log("combine()", "cannot combine response=%s", response, level=logging.ERROR)
     msg = "Cannot combine data because of unknown reason"
     raise Exception(msg)
 
 
+def combine_status(response):
+    """Combine the GetStatus responses of get_local_status()
+
+    The status of each neuron is taken from the process it is local
+    on, while the status dictionaries of devices from all processes are
+    merged with merge_dicts(). Both are put in the order of the
+    requested nodes and reduced to the requested keys. As a missing
+    response would leave gaps, an error is raised if any process
+    failed.
+
+    """
+
+    if any(rank_response is None for rank_response in response):
+        raise Exception('GetStatus failed on at least one process.')
+    keys = response[0]['keys']
+    result = [None] * response[0]['n_nodes']
+    devices = collections.defaultdict(list)
+
+    for rank_response in response:
+        indices, values = rank_response['neurons']
+        if isinstance(values, numpy.ndarray):
+            values = values.tolist()
+        for index, value in zip(indices.tolist(), values):
+            result[index] = value
+        indices, statuses = rank_response['devices']
+        for index, status in zip(indices.tolist(), statuses):
+            devices[index].append([status])
+
+    for index, device_dicts in devices.items():
+        result[index] = project_status(merge_dicts(device_dicts)[0], keys)
+
+    return result
+
+
 def merge_dicts(response):
     """Merge status dictionaries of recorders
 
@@ -447,7 +2066,7 @@ def merge_dicts(response):
     following steps:
       * sum up all n_events fields
       * if recording to memory: merge the event dictionaries by joining
-        all contained arrays
+        all contained arrays (see merge_events())
       * if recording to ascii: join filenames arrays
       * take all other values directly from the device on the first
         process
@@ -474,26 +2093,18 @@ def merge_dicts(response):
             result.append(tmp[0])
 
         if element_type == 'recorder':
-            tmp = deepcopy(device_dicts[0])
-            tmp['n_events'] = 0
-
-            for device_dict in device_dicts:
-                tmp['n_events'] += device_dict['n_events']
+            tmp = dict(device_dicts[0])
+            tmp['n_events'] = sum(device_dict['n_events'] for device_dict in device_dicts)  # noqa
 
             record_to = tmp['record_to']
             if record_to not in ('ascii', 'memory'):
                 msg = f'Cannot combine data when recording to "{record_to}".'
                 raise Exception(msg)
 
-            if record_to == 'memory':
-                event_keys = tmp['events'].keys()
-                for key in event_keys:
-                    tmp['events'][key] = []
-                for device_dict in device_dicts:
-                    for key in event_keys:
-                        tmp['events'][key].extend(device_dict['events'][key])
+            if record_to == 'memory' and 'events' in tmp:
+                tmp['events'] = merge_events([device_dict['events'] for device_dict in device_dicts])  # noqa
 
-            if record_to == 'ascii':
+            if record_to == 'ascii' and 'filenames' in tmp:
                 tmp['filenames'] = []
                 for device_dict in device_dicts:
                     tmp['filenames'].extend(device_dict['filenames'])
@@ -506,5 +2117,37 @@ def merge_dicts(response):
     return result
 
 
+def merge_events(events_dicts):
+    """Merge the event dictionaries of a recorder on all processes
+
+    The arrays of each event field are joined in order of the processes.
+    If all processes sent NumPy arrays, they are joined into a single
+    NumPy array, which is allocated once for all processes. Otherwise,
+    they are joined into a single list. If the environment variable
+    NEST_SERVER_SORT_EVENTS is set, all fields are ordered by the event
+    times in a stable sort, which merges the sorted runs of the single
+    processes.
+
+    """
+
+    events = {}
+    for key in events_dicts[0].keys():
+        values = [events_dict[key] for events_dict in events_dicts]
+        if all(isinstance(value, numpy.ndarray) for value in values):
+            events[key] = numpy.concatenate(values)
+        else:
+            events[key] = []
+            for value in values:
+                events[key].extend(value.tolist() if isinstance(value, numpy.ndarray) else value)  # noqa
+
+    if SORT_EVENTS and len(events.get('times', [])) > 0:
+        order = numpy.argsort(events['times'], kind='stable')
+        for key, value in events.items():
+            if len(value) == len(order):
+                events[key] = numpy.asarray(value)[order]
+
+    return events
+
+
 if __name__ == "__main__":
     app.run()
@@ -1,5 +1,6 @@
 
 import ruamel.yaml as yaml
+import hashlib
 import math
 import os
 
@@ -25,6 +26,25 @@ def expand_nodelist():
     return [f"{prefix}{str(id).zfill(8-len(prefix))}" for id in node_ids]
 
 
+def hash_folder(path):
+    """Return a hash over names and contents of all files below path.
+
+    Two folders with the same files (relative to path) and the same file
+    contents get the same hash, independent of timestamps.
+
+    """
+    sha = hashlib.sha1()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for fname in sorted(files):
+            fpath = os.path.join(root, fname)
+            sha.update(os.path.relpath(fpath, path).encode("utf-8"))
+            with open(fpath, "rb") as infile:
+                for chunk in iter(lambda: infile.read(1 << 20), b""):
+                    sha.update(chunk)
+    return sha.hexdigest()
+
+
 def get_config(config_fname):
 
     with open(config_fname, 'r') as config_file:
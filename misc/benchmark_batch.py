@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+"""
+Compares the latency of a CLE-like step sent to NEST Server as separate
+requests and as a single request to the /batch route. Like a step of the
+RoboBrain experiment, each step sets the rate of a number of Poisson
+generators, reads the events of a number of spike recorders and simulates
+for the length of a step. Requires a running NEST Server with the patched
+hl_api_server.py from fixes/.
+"""
+
+import argparse
+import statistics
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from nest_server_client import NestServerClient  # noqa: E402
+
+
+def setup_network(client, n_generators, n_recorders, n_neurons):
+    """
+    Creates Poisson generators driving a population of neurons, whose
+    spikes are recorded by several spike recorders. Returns the node IDs
+    of the generators and of the recorders.
+    """
+
+    client.call('ResetKernel')
+    generators = [client.call('Create', {'model': 'poisson_generator'})
+                  for _ in range(n_generators)]
+    neurons = client.call('Create', {'model': 'iaf_psc_alpha', 'n': n_neurons})
+    recorders = [client.call('Create', {'model': 'spike_recorder'})
+                 for _ in range(n_recorders)]
+    for generator in generators:
+        client.call('Connect', {'pre': generator, 'post': neurons,
+                                'syn_spec': {'weight': 100.0}})
+    for recorder in recorders:
+        client.call('Connect', {'pre': neurons, 'post': recorder})
+    return generators, recorders
+
+
+def make_step(generators, recorders, step, t_step):
+    """
+    Returns the calls of a CLE step as (call_name, data) tuples.
+    """
+
+    rate = 50000.0 if step // 25 % 2 else 0.0
+    calls = [('SetStatus', {'nodes': generator, 'params': {'rate': rate}})
+             for generator in generators]
+    calls += [('GetStatus', {'nodes': recorder}) for recorder in recorders]
+    calls.append(('Simulate', {'t': t_step}))
+    return calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('url', help='URL of NEST Server, e.g. http://localhost:5000')
+    parser.add_argument('--steps', type=int, default=100)
+    parser.add_argument('--generators', type=int, default=3)
+    parser.add_argument('--recorders', type=int, default=19)
+    parser.add_argument('--neurons', type=int, default=100)
+    parser.add_argument('--step-time', type=float, default=20.0,
+                        help='simulated time per step in ms')
+    args = parser.parse_args()
+
+    client = NestServerClient(args.url)
+
+    print('mode,steps,requests_per_step,median_step_latency,mean_step_latency')
+    for mode in ('separate', 'batch'):
+        generators, recorders = setup_network(
+            client, args.generators, args.recorders, args.neurons)
+        client.reset_timings()
+        times = []
+        for step in range(args.steps):
+            calls = make_step(generators, recorders, step, args.step_time)
+            tic = time.perf_counter()
+            if mode == 'batch':
+                client.batch(calls)
+            else:
+                for call_name, data in calls:
+                    client.call(call_name, data)
+            times.append(time.perf_counter() - tic)
+        requests_per_step = len(client.timings) / args.steps
+        print(f'{mode},{args.steps},{requests_per_step:g},'
+              f'{statistics.median(times):.6f},{statistics.mean(times):.6f}', flush=True)
+
+
+if __name__ == '__main__':
+    main()
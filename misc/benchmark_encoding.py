@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+"""
+Compares JSON and MessagePack responses of NEST Server for GetStatus on a
+spike recorder holding different numbers of events. Requires a running
+NEST Server with the patched hl_api_server.py from fixes/, and msgpack and
+numpy on the client.
+"""
+
+import argparse
+import statistics
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from nest_server_client import NestServerClient  # noqa: E402
+
+
+N_PARROTS = 100
+
+
+def setup_recorder(client, n_events):
+    """
+    Builds a network in which a spike recorder records n_events spikes
+    and returns the node ID of the recorder.
+    """
+
+    n_spikes = max(1, n_events // N_PARROTS)
+    spike_times = [round(0.1 * (i + 1), 1) for i in range(n_spikes)]
+
+    client.call('ResetKernel')
+    generator = client.call('Create', {
+        'model': 'spike_generator',
+        'params': {'spike_times': spike_times, 'allow_offgrid_times': True},
+    })
+    parrots = client.call('Create', {'model': 'parrot_neuron', 'n': N_PARROTS})
+    recorder = client.call('Create', {'model': 'spike_recorder'})
+    client.call('Connect', {'pre': generator, 'post': parrots})
+    client.call('Connect', {'pre': parrots, 'post': recorder})
+    client.call('Simulate', {'t': spike_times[-1] + 5.0})
+    return recorder
+
+
+def time_get_status(client, recorder, repetitions):
+    """
+    Returns the wall clock times and response sizes of GetStatus calls
+    on the recorder, including decoding of the response.
+    """
+
+    client.call('GetStatus', {'nodes': recorder})  # warm up the connection
+    client.reset_timings()
+    times = []
+    for _ in range(repetitions):
+        tic = time.perf_counter()
+        status = client.call('GetStatus', {'nodes': recorder})
+        times.append(time.perf_counter() - tic)
+    n_events = status[0]['n_events']
+    return n_events, times, [timing['bytes'] for timing in client.timings]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('url', help='URL of NEST Server, e.g. http://localhost:5000')
+    parser.add_argument('--events', type=int, nargs='+',
+                        default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--repetitions', type=int, default=10)
+    args = parser.parse_args()
+
+    clients = {
+        'json': NestServerClient(args.url),
+        'msgpack': NestServerClient(args.url, binary=True),
+    }
+
+    print('events,encoding,bytes,median_latency,min_latency')
+    for n_events in args.events:
+        recorder = setup_recorder(clients['json'], n_events)
+        for encoding, client in clients.items():
+            n, times, sizes = time_get_status(client, recorder, args.repetitions)
+            print(f'{n},{encoding},{max(sizes)},'
+                  f'{statistics.median(times):.6f},{min(times):.6f}', flush=True)
+
+
+if __name__ == '__main__':
+    main()
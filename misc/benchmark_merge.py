@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+"""
+Micro-benchmark of merging the GetStatus responses of a spike recorder
+from several MPI ranks, comparing merge_dicts() of the patched
+hl_api_server.py in fixes/ to the original deepcopy-based merge. Needs the
+modules imported by hl_api_server.py, i.e. it is best run in the NEST
+Server container.
+"""
+
+import argparse
+import statistics
+import random
+import time
+import sys
+import os
+
+from copy import deepcopy
+
+import numpy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'fixes'))
+import hl_api_server  # noqa: E402
+
+
+def merge_dicts_deepcopy(response):
+    """
+    Merge of recorder dictionaries as done by the original hl_api_server.py.
+    """
+
+    result = []
+    for device_dicts in zip(*response):
+        tmp = deepcopy(device_dicts[0])
+        tmp['n_events'] = 0
+        for device_dict in device_dicts:
+            tmp['n_events'] += device_dict['n_events']
+        event_keys = tmp['events'].keys()
+        for key in event_keys:
+            tmp['events'][key] = []
+        for device_dict in device_dicts:
+            for key in event_keys:
+                tmp['events'][key].extend(device_dict['events'][key])
+        result.append(tmp)
+    return result
+
+
+def make_response(n_ranks, n_events, t_sim=1000.0):
+    """
+    Creates the gathered GetStatus response of a spike recorder, in which
+    each rank recorded n_events / n_ranks spikes.
+    """
+
+    response = []
+    for rank in range(n_ranks):
+        n = n_events // n_ranks
+        times = sorted(random.uniform(0.0, t_sim) for _ in range(n))
+        senders = [random.randrange(rank + 1, 100000, n_ranks) for _ in range(n)]
+        response.append([{
+            'element_type': 'recorder',
+            'record_to': 'memory',
+            'model': 'spike_recorder',
+            'global_id': 1,
+            'label': '',
+            'n_events': n,
+            'events': {'senders': senders, 'times': times},
+        }])
+    return response
+
+
+def time_call(func, response, repetitions):
+    times = []
+    for _ in range(repetitions):
+        tic = time.perf_counter()
+        func(response)
+        times.append(time.perf_counter() - tic)
+    return statistics.median(times)
+
+
+def to_arrays(response):
+    """
+    Converts the event lists of a response to NumPy arrays.
+    """
+
+    response = deepcopy(response)
+    for rank_response in response:
+        for device_dict in rank_response:
+            for key, value in device_dict['events'].items():
+                device_dict['events'][key] = numpy.asarray(value)
+    return response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--ranks', type=int, nargs='+', default=[2, 4, 8, 16, 32, 64, 128])
+    parser.add_argument('--events', type=int, nargs='+', default=[10000, 1000000])
+    parser.add_argument('--repetitions', type=int, default=5)
+    args = parser.parse_args()
+
+    # deepcopy: original merge of the event lists sent by the ranks
+    # lists: merge_dicts() on event lists
+    # arrays: merge_dicts() on event arrays
+    print('ranks,events,deepcopy,lists,arrays')
+    for n_events in args.events:
+        for n_ranks in args.ranks:
+            response = make_response(n_ranks, n_events)
+            t_old = time_call(merge_dicts_deepcopy, response, args.repetitions)
+            t_lists = time_call(hl_api_server.merge_dicts, response, args.repetitions)
+            t_arrays = time_call(hl_api_server.merge_dicts, to_arrays(response),
+                                 args.repetitions)
+            print(f'{n_ranks},{n_events},{t_old:.6f},{t_lists:.6f},{t_arrays:.6f}',
+                  flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+"""
+Compares reading raw data of a population from NEST Server and reducing it
+on the client to the Reduce call of the patched hl_api_server.py in fixes/,
+which reduces the data on the ranks. Times the mean membrane potential of
+the neurons and the number of spikes in a time window for different numbers
+of neurons. Requires a running NEST Server with the patched
+hl_api_server.py.
+"""
+
+import argparse
+import statistics
+import time
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from nest_server_client import NestServerClient  # noqa: E402
+
+
+def setup_population(client, n_neurons, t_sim):
+    """
+    Builds a population of neurons driven by Poisson noise, whose spikes
+    are recorded by a spike recorder, and simulates it. Returns the node
+    IDs of the neurons and the recorder.
+    """
+
+    client.call('ResetKernel')
+    neurons = client.call('Create', {'model': 'iaf_psc_alpha', 'n': n_neurons})
+    noise = client.call('Create', {'model': 'poisson_generator',
+                                   'params': {'rate': 20000.0}})
+    recorder = client.call('Create', {'model': 'spike_recorder'})
+    client.call('Connect', {'pre': noise, 'post': neurons, 'syn_spec': {'weight': 1.2}})
+    client.call('Connect', {'pre': neurons, 'post': recorder})
+    client.call('Simulate', {'t': t_sim})
+    return neurons, recorder
+
+
+def mean_v_m_raw(client, neurons, window):
+    status = client.call('GetStatus', {'nodes': neurons})
+    return sum(neuron['V_m'] for neuron in status) / len(status)
+
+
+def mean_v_m_reduce(client, neurons, window):
+    return client.call('Reduce', {'nodes': neurons, 'quantity': 'V_m', 'op': 'mean'})
+
+
+def count_spikes_raw(client, recorder, window):
+    times = client.call('GetStatus', {'nodes': recorder})[0]['events']['times']
+    return sum(1 for t in times if window[0] <= t < window[1])
+
+
+def count_spikes_reduce(client, recorder, window):
+    return client.call('Reduce', {'nodes': recorder, 'quantity': 'times', 'op': 'count',
+                                  'start': window[0], 'stop': window[1]})
+
+
+def time_read(client, func, nodes, window, repetitions):
+    """
+    Returns the result, the wall clock times and the response sizes of
+    reading the data with func, including the reduction on the client.
+    """
+
+    func(client, nodes, window)  # warm up the connection
+    client.reset_timings()
+    times = []
+    for _ in range(repetitions):
+        tic = time.perf_counter()
+        result = func(client, nodes, window)
+        times.append(time.perf_counter() - tic)
+    return result, times, [timing['bytes'] for timing in client.timings]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('url', help='URL of NEST Server, e.g. http://localhost:5000')
+    parser.add_argument('--neurons', type=int, nargs='+', default=[1000, 100000])
+    parser.add_argument('--t-sim', type=float, default=1000.0,
+                        help='simulated time in ms')
+    parser.add_argument('--window', type=float, default=20.0,
+                        help='length of the time window of the spike count in ms')
+    parser.add_argument('--repetitions', type=int, default=10)
+    args = parser.parse_args()
+
+    client = NestServerClient(args.url)
+    window = (args.t_sim - args.window, args.t_sim)
+    reads = [
+        ('mean_v_m', 'raw', mean_v_m_raw, 0),
+        ('mean_v_m', 'reduce', mean_v_m_reduce, 0),
+        ('spike_count', 'raw', count_spikes_raw, 1),
+        ('spike_count', 'reduce', count_spikes_reduce, 1),
+    ]
+
+    print('neurons,quantity,path,result,bytes,median_latency,min_latency')
+    for n_neurons in args.neurons:
+        nodes = setup_population(client, n_neurons, args.t_sim)
+        for quantity, path, func, index in reads:
+            result, times, sizes = time_read(client, func, nodes[index], window,
+                                             args.repetitions)
+            print(f'{n_neurons},{quantity},{path},{result},{max(sizes)},'
+                  f'{statistics.median(times):.6f},{min(times):.6f}', flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+"""
+Checks GetStatus of the patched hl_api_server.py in fixes/ on a collection
+that mixes neurons and a device, [neurons + spike_recorder + neurons], which
+the server handles differently from collections of only neurons or devices
+with MPI. The status of the mixed collection must be the same as the status
+of its parts requested separately, for a single key, a list of keys and the
+full status. Requires a running NEST Server with the patched
+hl_api_server.py, preferably with several MPI processes.
+"""
+
+import argparse
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from nest_server_client import NestServerClient  # noqa: E402
+
+
+def setup_network(client, n_neurons, t_sim):
+    """
+    Creates two populations of neurons driven by Poisson noise with a
+    spike recorder created in between, so that the node IDs of the
+    recorder lie between those of the populations, and simulates them.
+    Returns the node IDs of the populations and the recorder.
+    """
+
+    client.call('ResetKernel')
+    first = client.call('Create', {'model': 'iaf_psc_alpha', 'n': n_neurons})
+    recorder = client.call('Create', {'model': 'spike_recorder'})
+    second = client.call('Create', {'model': 'iaf_psc_alpha', 'n': n_neurons})
+    noise = client.call('Create', {'model': 'poisson_generator',
+                                   'params': {'rate': 20000.0}})
+    client.call('Connect', {'pre': noise, 'post': first + second, 'syn_spec': {'weight': 50.0}})
+    client.call('Connect', {'pre': first + second, 'post': recorder})
+    client.call('Simulate', {'t': t_sim})
+    return first, recorder, second
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('url', help='URL of NEST Server, e.g. http://localhost:5000')
+    parser.add_argument('--neurons', type=int, default=100,
+                        help='number of neurons of each population')
+    parser.add_argument('--t-sim', type=float, default=100.0,
+                        help='simulated time in ms')
+    args = parser.parse_args()
+
+    client = NestServerClient(args.url)
+    first, recorder, second = setup_network(client, args.neurons, args.t_sim)
+
+    ok = True
+    for keys in ['global_id', ['global_id', 'model'], None]:
+        mixed = client.call('GetStatus', {'nodes': first + recorder + second, 'keys': keys})
+        parts = []
+        for nodes in (first, recorder, second):
+            parts.extend(client.call('GetStatus', {'nodes': nodes, 'keys': keys}))
+        if keys is None:
+            # Compare the fields that do not depend on the rank answering
+            fields = ('global_id', 'element_type', 'model')
+            mixed = [[status[field] for field in fields] for status in mixed]
+            parts = [[status[field] for field in fields] for status in parts]
+        same = mixed == parts
+        ok &= same
+        print(f'keys={keys}: {len(mixed)} nodes, {"same" if same else "DIFFERENT"}')
+
+    status = client.call('GetStatus', {'nodes': first + recorder + second})[args.neurons]
+    n_events = client.call('GetStatus', {'nodes': recorder, 'keys': 'n_events'})[0]
+    same = status['n_events'] == n_events == len(status['events']['times'])
+    ok &= same
+    print(f'recorder in mixed collection: {status["n_events"]} events, '
+          f'{"same" if same else "DIFFERENT"} as recorder alone')
+
+    print('ok' if ok else 'FAILED')
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+"""
+Checks that stimulus updates scheduled with ScheduleUpdates on the patched
+hl_api_server.py in fixes/ change the spike output of the simulation. A
+Poisson generator drives parrot neurons, and its rate is toggled off and on
+every few steps while RunSteps simulates all steps at once. The parrot
+neurons must not spike while the rate is off and must spike while it is on,
+and their spikes must be the same as when the client simulates each step
+with Simulate and toggles the rate with SetStatus itself. Requires a running
+NEST Server with the patched hl_api_server.py.
+"""
+
+import argparse
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from nest_server_client import NestServerClient  # noqa: E402
+
+
+DELAY = 1.0  # delay from the generator to the parrot neurons in ms
+
+
+def setup_network(client, n_parrots, rate):
+    """
+    Builds a Poisson generator that drives parrot neurons, whose spikes
+    are recorded by a spike recorder. Returns the node IDs of the
+    generator and the recorder.
+    """
+
+    client.call('ResetKernel')
+    generator = client.call('Create', {'model': 'poisson_generator',
+                                       'params': {'rate': rate}})
+    parrots = client.call('Create', {'model': 'parrot_neuron', 'n': n_parrots})
+    recorder = client.call('Create', {'model': 'spike_recorder'})
+    client.call('Connect', {'pre': generator, 'post': parrots,
+                            'syn_spec': {'delay': DELAY}})
+    client.call('Connect', {'pre': parrots, 'post': recorder})
+    return generator, recorder
+
+
+def get_spikes(client, recorder):
+    """
+    Returns the senders and times of the spikes of the recorder, ordered
+    by time and sender.
+    """
+
+    events = client.call('GetStatus', {'nodes': recorder})[0]['events']
+    spikes = sorted(zip(events['times'], events['senders']))
+    return [sender for _, sender in spikes], [t for t, _ in spikes]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('url', help='URL of NEST Server, e.g. http://localhost:5000')
+    parser.add_argument('--parrots', type=int, default=10)
+    parser.add_argument('--rate', type=float, default=1000.0,
+                        help='rate of the Poisson generator while it is on in spikes/s')
+    parser.add_argument('--steps', type=int, default=100, help='number of steps')
+    parser.add_argument('--step', type=float, default=20.0, help='length of a step in ms')
+    parser.add_argument('--toggle-every', type=int, default=25,
+                        help='number of steps after which the rate is toggled')
+    args = parser.parse_args()
+
+    client = NestServerClient(args.url)
+    window = args.toggle_every * args.step
+    windows = [(start * args.step, min(start + args.toggle_every, args.steps) * args.step)
+               for start in range(0, args.steps, args.toggle_every)]
+
+    # Reference: the client sets the rate and simulates each step itself
+    generator, recorder = setup_network(client, args.parrots, args.rate)
+    for step in range(args.steps):
+        if step % args.toggle_every == 0:
+            rate = 0.0 if step // args.toggle_every % 2 else args.rate
+            client.call('SetStatus', {'nodes': generator, 'params': {'rate': rate}})
+        client.call('Simulate', {'t': args.step})
+    reference = get_spikes(client, recorder)
+
+    generator, recorder = setup_network(client, args.parrots, args.rate)
+    updates = [{'time': start, 'nodes': generator, 'parameter': 'rate',
+                'value': 0.0 if index % 2 else args.rate}
+               for index, (start, _) in enumerate(windows)]
+    client.schedule_updates(updates, clear=True)
+    result = client.run_steps(args.steps, args.step)
+    senders, times = get_spikes(client, recorder)
+
+    # Spikes reach the parrot neurons after the delay, so that the start of
+    # each window is left out
+    ok = result['applied_updates'] == len(updates)
+    print('start,stop,rate,spikes')
+    for index, (start, stop) in enumerate(windows):
+        spikes = sum(1 for t in times if start + 2 * DELAY <= t < stop)
+        rate_on = index % 2 == 0
+        ok &= (spikes > 0) if rate_on else (spikes == 0)
+        print(f'{start},{stop},{args.rate if rate_on else 0.0},{spikes}', flush=True)
+
+    same = (senders, times) == reference
+    ok &= same
+    print(f'{len(times)} spikes, {"same" if same else "DIFFERENT"} as with '
+          f'{args.steps} Simulate calls ({len(reference[1])} spikes)')
+    print(f'applied {result["applied_updates"]} of {len(updates)} updates, '
+          f'toggling every {window} ms: {"ok" if ok else "FAILED"}')
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
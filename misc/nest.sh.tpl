@@ -3,7 +3,7 @@ module load sarus
 
 srun --jobid={jobid} -C mc -A {account} --mpi=pmi2 -v \
      --cpu-bind=threads --distribution=block:cyclic:fcyclic \
-     -N {n_nodes_nest} -n {n_tasks_nest} --exclude={nodezero} \
+     -N {n_nodes_nest} -n {n_tasks_nest} --nodelist={nodes} \
      sarus run \
            --mount=type=bind,source=$HOME,dst=$HOME \
            load/library/nest_latest_daint:latest \
@@ -11,8 +11,9 @@ srun --jobid={jobid} -C mc -A {account} --mpi=pmi2 -v \
                source /opt/nest/bin/nest_vars.sh; \
 	       ln -s /users/bp000231/bf_data/nestserver_benchmarks/Experiments/RoboBrain_benchmark/1_nrpexperiment_robobrain_mouse/resources /opt/data; \
 	       cp /users/bp000231/bf_data/nestserver_benchmarks/fixes/hl_api_server.py /opt/nest/lib/python3.8/site-packages/nest/server/hl_api_server.py; \
+	       cp /users/bp000231/bf_data/nestserver_benchmarks/fixes/nest-server-mpi /opt/nest/bin/nest-server-mpi; \
 	       echo NEST server dir is; \
 	       ls /opt/nest/lib/python3.8/site-packages/nest/server; \
 	       export NEST_SERVER_MODULES="nest,numpy,time,math"; \
 	       export NEST_SERVER_RESTRICTION_OFF=true; \
-               nest-server-mpi --host 0.0.0.0 --port 5000'
+               nest-server-mpi --host 0.0.0.0 --port {port}'
@@ -0,0 +1,328 @@
+import functools
+import json
+import time
+import uuid
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import HTTPConnectionPool
+from urllib3.util.retry import Retry
+
+try:
+    import msgpack
+    import numpy
+except ImportError:
+    msgpack = None
+
+
+MSGPACK_MIMETYPE = 'application/vnd.msgpack'
+NDARRAY_EXT_TYPE = 1
+
+
+class NestServerClient:
+    """
+    Client for NEST Server that keeps its connection alive between calls
+    and records the timing of every request.
+
+    For each request, the following times (in seconds) are recorded:
+      * total: wall clock time of the whole request
+      * request: time from sending the request until the response headers
+        arrived, including connection setup and server processing
+      * connect: time needed to open a new connection (0 if an open
+        connection was reused)
+      * send: time needed to send the request, without connect
+      * server: processing time reported by the server in the
+        X-Nest-Server-Time header (NaN if the server does not report it)
+      * receive: time needed to read the response body
+    Additionally, new_connection tells if a new TCP connection had to be
+    opened for the request and bytes gives the size of the response body.
+
+    With binary=True, the client asks the server for MessagePack instead
+    of JSON responses, in which numeric arrays are sent as raw buffers
+    and decoded to NumPy arrays. This requires msgpack and numpy.
+    """
+
+    def __init__(self, url, timeout=None, retries=3, binary=False):
+        """
+        :param url: Base URL of NEST Server, e.g. http://nid00001:5000
+        :param timeout: Default timeout for requests in seconds
+        :param retries: Number of retries if a connection cannot be opened
+        :param binary: Request MessagePack instead of JSON responses
+        """
+
+        if binary and msgpack is None:
+            raise ImportError("Binary responses require msgpack and numpy")
+
+        self.url = url
+        self.timeout = timeout
+        self.timings = []
+        self.client_id = uuid.uuid4().hex
+        self.event_cursors = {}
+
+        # Only retry connection errors, as NEST calls are not idempotent
+        retry = Retry(total=retries, connect=retries, read=0, status=0,
+                      backoff_factor=0.5)
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=4,
+                                   max_retries=retry)
+        self.connection_stats = {'connections': 0, 'connect': 0.0, 'send': 0.0}
+        self.adapter.poolmanager.pool_classes_by_scheme = dict(
+            self.adapter.poolmanager.pool_classes_by_scheme,
+            http=functools.partial(TimedHTTPConnectionPool, stats=self.connection_stats))
+
+        self.session = requests.Session()
+        self.session.mount('http://', self.adapter)
+        self.session.headers.update({
+            'Content-type': 'application/json',
+            'Accept': 'text/plain',
+        })
+        if binary:
+            self.session.headers['Accept'] = f'{MSGPACK_MIMETYPE}, application/json;q=0.9'
+
+    def call(self, call_name, data=None, timeout=None):
+        """
+        Calls a PyNEST function and returns its decoded result.
+        :param call_name: Name of the PyNEST function
+        :param data: Arguments to pass to the function
+        :param timeout: Timeout for this call in seconds
+        """
+
+        return self.decode(self.post(f'api/{call_name}', data, timeout, call_name))
+
+    def batch(self, calls, timeout=None):
+        """
+        Calls several PyNEST functions with a single request to the /batch
+        route and returns the list of their decoded results.
+        :param calls: List of (call_name, data) tuples, where data are the
+            arguments to pass to the function as in call()
+        :param timeout: Timeout for the whole batch in seconds
+        """
+
+        items = []
+        for call_name, data in calls:
+            if data is None:
+                items.append({'call': call_name})
+            elif isinstance(data, dict):
+                items.append(dict(data, call=call_name))
+            else:
+                items.append({'call': call_name, 'args': list(data)})
+        return self.decode(self.post('batch', items, timeout, 'batch'))
+
+    def events(self, recorder, clear=False, timeout=None):
+        """
+        Returns the status of the recorders with the events recorded since
+        the last call of this method, using the GetEvents call of the
+        patched NEST Server.
+        :param recorder: List of node IDs of the recorders
+        :param clear: Delete the events on the server after reading them
+        :param timeout: Timeout for this call in seconds
+        """
+
+        key = tuple(recorder)
+        status = self.call('GetEvents', {
+            'nodes': recorder,
+            'since': self.event_cursors.get(key),
+            'clear': clear,
+            'client': self.client_id,
+        }, timeout)
+        if status:
+            self.event_cursors[key] = status[0]['cursor']
+        return status
+
+    def schedule_updates(self, updates, clear=False, timeout=None):
+        """
+        Schedules parameter updates of nodes at simulation times with the
+        ScheduleUpdates call of the patched NEST Server and returns the
+        number of scheduled updates.
+        :param updates: List of dictionaries with the simulation time in ms
+            in time, the node IDs in nodes and either the parameters in
+            params or a single parameter in parameter and its value
+        :param clear: Drop the updates scheduled before
+        :param timeout: Timeout for this call in seconds
+        """
+
+        return self.call('ScheduleUpdates', {'updates': updates, 'clear': clear}, timeout)
+
+    def run_steps(self, steps, step, timeout=None):
+        """
+        Simulates a number of steps with a single request to the RunSteps
+        call of the patched NEST Server, which applies the scheduled
+        updates on the way. Returns the biological time and the numbers of
+        applied and still scheduled updates.
+        :param steps: Number of steps to simulate
+        :param step: Length of a step in ms
+        :param timeout: Timeout for this call in seconds
+        """
+
+        return self.call('RunSteps', {'steps': steps, 'step': step}, timeout)
+
+    def exec(self, source, timeout=None, **kwargs):
+        """
+        Executes a script on NEST Server and returns the decoded response.
+        :param source: Python source code of the script
+        :param timeout: Timeout for this call in seconds
+        """
+
+        data = {'source': source}
+        data.update(kwargs)
+        return self.decode(self.post('exec', data, timeout, 'exec'))
+
+    def metrics(self, timeout=None):
+        """
+        Scrapes the metrics of NEST Server in the Prometheus text format and
+        returns them as list of (name, labels, value) tuples.
+        :param timeout: Timeout for this request in seconds
+        """
+
+        samples = []
+        for line in self.get('metrics', timeout).text.splitlines():
+            if not line or line.startswith('#'):
+                continue
+            sample, value = line.rsplit(' ', 1)
+            name, _, labels = sample.partition('{')
+            labels = dict(label.split('=', 1) for label in labels.rstrip('}').split(',') if label)
+            samples.append((name, {key: value.strip('"') for key, value in labels.items()},
+                            float(value)))
+        return samples
+
+    def get(self, path='', timeout=None):
+        """
+        Sends a GET request to the given route of NEST Server.
+        :param path: Route relative to the server URL
+        :param timeout: Timeout for this request in seconds
+        """
+
+        return self.request('GET', path, None, timeout, path or 'index')
+
+    def post(self, path, data=None, timeout=None, label=None):
+        """
+        Sends a POST request with JSON data to the given route of NEST Server.
+        :param path: Route relative to the server URL
+        :param data: Data to send as JSON
+        :param timeout: Timeout for this request in seconds
+        :param label: Name to record the timing under
+        """
+
+        return self.request('POST', path, {} if data is None else data,
+                            timeout, label or path)
+
+    def request(self, method, path, data, timeout, label):
+        """
+        Sends a request to NEST Server and records its timing.
+        """
+
+        url = f'{self.url}/{path}'
+        stats = dict(self.connection_stats)
+
+        tic = time.perf_counter()
+        response = self.session.request(
+            method, url, stream=True,
+            data=None if data is None else json.dumps(data, default=to_builtin),
+            timeout=self.timeout if timeout is None else timeout,
+        )
+        request_time = response.elapsed.total_seconds()
+        response.content  # read the body
+        total_time = time.perf_counter() - tic
+
+        self.timings.append({
+            'call': label,
+            'total': total_time,
+            'request': request_time,
+            'connect': self.connection_stats['connect'] - stats['connect'],
+            'send': self.connection_stats['send'] - stats['send'],
+            'server': float(response.headers.get('X-Nest-Server-Time', 'nan')),
+            'receive': max(0.0, total_time - request_time),
+            'new_connection': self.connection_stats['connections'] > stats['connections'],
+            'bytes': len(response.content),
+        })
+
+        response.raise_for_status()
+        return response
+
+    @staticmethod
+    def decode(response):
+        """
+        Decodes the body of a response according to its content type.
+        :param response: Response of NEST Server
+        """
+
+        if response.headers.get('Content-Type', '').startswith(MSGPACK_MIMETYPE):
+            return msgpack.unpackb(response.content, ext_hook=unpack_ndarray,
+                                   raw=False, strict_map_key=False)
+        return response.json()
+
+    def reset_timings(self):
+        """
+        Clears the recorded request timings.
+        """
+
+        self.timings = []
+
+    def close(self):
+        """
+        Closes all open connections.
+        """
+
+        self.session.close()
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    """
+    Connection pool that counts the connections it opens and adds up the
+    time needed to open them and to send requests over them in the stats
+    dictionary of its client, which the client reads before and after
+    each request.
+    """
+
+    def __init__(self, *args, stats, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = stats
+
+    def _new_conn(self):
+        conn = super()._new_conn()
+        connect, send = conn.connect, conn.request
+
+        def timed_connect(*args, **kwargs):
+            tic = time.perf_counter()
+            try:
+                return connect(*args, **kwargs)
+            finally:
+                # The connection is opened while sending the first request,
+                # so that its time is moved from send to connect
+                elapsed = time.perf_counter() - tic
+                self.stats['connections'] += 1
+                self.stats['connect'] += elapsed
+                self.stats['send'] -= elapsed
+
+        def timed_send(*args, **kwargs):
+            tic = time.perf_counter()
+            try:
+                return send(*args, **kwargs)
+            finally:
+                self.stats['send'] += time.perf_counter() - tic
+
+        conn.connect, conn.request = timed_connect, timed_send
+        return conn
+
+
+def to_builtin(obj):
+    """
+    Converts NumPy arrays and scalars for JSON encoding of request data.
+    """
+
+    if msgpack is not None and isinstance(obj, (numpy.ndarray, numpy.generic)):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def unpack_ndarray(code, data):
+    """
+    Unpacks a NumPy array sent by NEST Server as MessagePack extension type.
+    """
+
+    if code != NDARRAY_EXT_TYPE:
+        return msgpack.ExtType(code, data)
+    unpacker = msgpack.Unpacker(raw=False)
+    unpacker.feed(data)
+    dtype, shape = unpacker.unpack()
+    offset = unpacker.tell()
+    return numpy.frombuffer(data, dtype=dtype, offset=offset).reshape(shape)
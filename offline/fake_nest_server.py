@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+
+"""
+Stand-in for NEST Server that serves the routes of fixes/hl_api_server.py
+without NEST, MPI or Flask. All calls answer with plausible data after a
+configurable delay, so the benchmark runner can be run and timed offline.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import threading
+import json
+import time
+
+
+# Calls the fake server knows about; all others answer with null
+NEST_CALLS = ['Connect', 'Create', 'GetConnections', 'GetDefaults',
+              'GetKernelStatus', 'GetStatus', 'ResetKernel', 'SetDefaults',
+              'SetKernelStatus', 'SetStatus', 'Simulate']
+
+
+class FakeKernel:
+    """
+    Minimal kernel state: the network size and the simulated time.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.lock = threading.Lock()  # NEST calls are serialized
+        self.calls = {}  # call name -> [count, duration]
+        self.reset()
+
+    def reset(self):
+        self.biological_time = 0.0
+        self.network_size = 0
+        self.num_connections = 0
+        self.time_create = 0.0
+        self.time_connect = 0.0
+        self.time_simulate = 0.0
+
+    def kernel_status(self):
+        return {
+            "biological_time": self.biological_time,
+            "local_num_threads": 1,
+            "network_size": self.network_size,
+            "num_connections": self.num_connections,
+            "num_processes": self.args.tasks,
+            "time_construction_connect": self.time_connect,
+            "time_construction_create": self.time_create,
+            "time_simulate": self.time_simulate,
+        }
+
+    def metrics(self):
+        lines = []
+        for name, (count, duration) in list(self.calls.items()):
+            lines.append(f'nest_server_calls_total{{call="{name}"}} {count}')
+            lines.append(f'nest_server_call_duration_seconds_sum{{call="{name}"}} {duration}')
+        return ''.join(line + '\n' for line in lines)
+
+    def call(self, call_name, kwargs):
+        with self.lock:
+            tic = time.perf_counter()
+            response = self.run_call(call_name, kwargs)
+            stats = self.calls.setdefault(call_name, [0, 0.0])
+            stats[0] += 1
+            stats[1] += time.perf_counter() - tic
+            return response
+
+    def run_call(self, call_name, kwargs):
+        time.sleep(self.args.call_latency)
+        if call_name == 'Simulate':
+            t = float(kwargs.get('t', kwargs.get('args', [0.0])[0]))
+            tic = time.time()
+            time.sleep(t * self.args.simulate_factor / self.args.tasks)
+            self.time_simulate = time.time() - tic
+            self.biological_time += t
+            return None
+        if call_name == 'RunSteps':
+            self.run_call('Simulate', {'t': float(kwargs['steps']) * float(kwargs['step'])})
+            return {'biological_time': self.biological_time,
+                    'applied_updates': 0, 'scheduled_updates': 0}
+        if call_name == 'Create':
+            n = int(kwargs.get('n', 1))
+            self.network_size += n
+            return list(range(self.network_size - n + 1, self.network_size + 1))
+        if call_name == 'GetKernelStatus':
+            return self.kernel_status()
+        if call_name == 'ResetKernel':
+            self.reset()
+        return None
+
+    def exec(self, kwargs):
+        with self.lock:
+            tic = time.time()
+            time.sleep(self.args.exec_latency / self.args.tasks)
+            self.network_size = self.args.network_size
+            self.num_connections = self.args.network_size * 100
+            self.time_create = (time.time() - tic) / 2
+            self.time_connect = (time.time() - tic) / 2
+            response = {}
+            if 'return' in kwargs:
+                response['data'] = None
+            return response
+
+
+class FakeNestServerHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        self.handle_request()
+
+    def do_POST(self):
+        self.handle_request()
+
+    def handle_request(self):
+        tic = time.perf_counter()
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length) if length else b''
+        kwargs = json.loads(body) if body else {}
+        if not isinstance(kwargs, dict):
+            kwargs = {'args': kwargs if isinstance(kwargs, list) else [kwargs]}
+
+        kernel = self.server.kernel
+        path = self.path.split('?')[0].rstrip('/')
+        if path == '':
+            self.send_json({'nest': 'fake', 'mpi': kernel.args.tasks > 1}, tic)
+        elif path == '/health':
+            self.send_json({'status': 'ok', 'busy': kernel.lock.locked(), 'queued': 0}, tic)
+        elif path == '/metrics':
+            self.send_text(kernel.metrics(), tic)
+        elif path == '/api':
+            self.send_json(NEST_CALLS, tic)
+        elif path.startswith('/api/'):
+            self.send_json(kernel.call(path[5:], kwargs), tic)
+        elif path == '/batch':
+            self.send_json([kernel.call(item.pop('call'), item) for item in kwargs['args']], tic)
+        elif path == '/exec':
+            self.send_json(kernel.exec(kwargs), tic)
+        else:
+            self.send_error(404)
+
+    def send_json(self, data, tic):
+        self.send_payload(json.dumps(data).encode('utf-8'), 'application/json', tic)
+
+    def send_text(self, text, tic):
+        self.send_payload(text.encode('utf-8'), 'text/plain; version=0.0.4', tic)
+
+    def send_payload(self, payload, content_type, tic):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.send_header('X-Nest-Server-Time', f'{time.perf_counter() - tic:.7f}')
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--tasks', type=int, default=1,
+                        help='number of NEST tasks to pretend; divides compute delays')
+    parser.add_argument('--startup-delay', type=float, default=2.0,
+                        help='seconds to wait before accepting connections')
+    parser.add_argument('--call-latency', type=float, default=0.001,
+                        help='seconds added to every API call')
+    parser.add_argument('--exec-latency', type=float, default=1.0,
+                        help='seconds an /exec call takes with one task')
+    parser.add_argument('--simulate-factor', type=float, default=0.001,
+                        help='wall seconds per simulated ms with one task')
+    parser.add_argument('--network-size', type=int, default=1000)
+    parser.add_argument('--quiet', action='store_true')
+    args = parser.parse_args()
+
+    time.sleep(args.startup_delay)
+
+    server = ThreadingHTTPServer((args.host, args.port), FakeNestServerHandler)
+    server.daemon_threads = True
+    server.kernel = FakeKernel(args)
+    server.quiet = args.quiet
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,11 @@
+#!/bin/bash
+
+# Offline stand-in for misc/nest.sh.tpl: runs the fake NEST Server locally
+# instead of the NEST container on the allocation.
+
+mkdir -p $FAKE_SLURM_DIR
+
+python3 {working_dir}/offline/fake_nest_server.py \
+        --tasks {n_tasks_nest} --port {port} --quiet $FAKE_NEST_SERVER_ARGS &
+echo $! > $FAKE_SLURM_DIR/{jobid}.{jobstep}.pid
+wait
@@ -0,0 +1,124 @@
+"""
+Stand-in for the VirtualCoach of pynrp. Put the offline/ folder first on the
+PYTHONPATH to use it instead of the real one.
+
+Cloned experiments and their profiler data are kept below FAKE_NRP_DIR. A
+launched experiment runs FAKE_NRP_STEPS CLE steps, each consisting of a robot
+step of FAKE_NRP_ROBOT_STEP seconds and a Simulate call of 20 ms on the NEST
+Server at FAKE_NEST_URL, and writes cle_time_profile_0.csv like the CLE
+profiler does.
+"""
+
+import threading
+import shutil
+import uuid
+import time
+import os
+
+import requests
+
+
+FAKE_NRP_DIR = os.environ.get('FAKE_NRP_DIR', '/tmp/fake_nrp')
+FAKE_NEST_URL = os.environ.get('FAKE_NEST_URL', 'http://127.0.0.1:5000')
+FAKE_NRP_STEPS = int(os.environ.get('FAKE_NRP_STEPS', 50))
+FAKE_NRP_ROBOT_STEP = float(os.environ.get('FAKE_NRP_ROBOT_STEP', 0.005))
+
+
+class ImportResponse:
+    """
+    Response of an experiment import, as returned by requests.
+    """
+
+    def __init__(self, content):
+        self.content = content
+
+
+class Simulation:
+    """
+    Running experiment that reports its status to registered callbacks.
+    """
+
+    def __init__(self, experiment_dir):
+        self.experiment_dir = experiment_dir
+        self.callbacks = []
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def register_status_callback(self, callback):
+        self.callbacks.append(callback)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+
+    def notify(self, state, simulation_time):
+        for callback in self.callbacks:
+            callback({'state': state, 'simulationTime': simulation_time})
+
+    def run(self):
+        session = requests.Session()
+        rows = []
+        for step in range(FAKE_NRP_STEPS):
+            if self.stopped.is_set():
+                break
+
+            tic = time.time()
+            time.sleep(FAKE_NRP_ROBOT_STEP)
+            robot_step = time.time() - tic
+
+            tic = time.time()
+            session.post(f'{FAKE_NEST_URL}/api/Simulate', json={'t': 20.0})
+            brain_step = time.time() - tic
+            rows.append((robot_step, brain_step, brain_step,
+                         max(robot_step, brain_step)))
+            self.notify('started', (step + 1) * 0.02)
+
+        # The CLE writes the profiler data after the experiment stopped
+        self.notify('stopped', len(rows) * 0.02)
+        profiler_dir = os.path.join(self.experiment_dir, 'profiler')
+        os.makedirs(profiler_dir, exist_ok=True)
+        with open(os.path.join(profiler_dir, 'cle_time_profile_0.csv'), 'w') as outfile:
+            outfile.write('robot_step,brain_step,brain_refresh,cle_step,Simulation_reset\n')
+            for row in rows:
+                outfile.write(','.join(str(value) for value in row) + '\n')
+
+
+class VirtualCoach:
+    """
+    Offline VirtualCoach offering the calls used by run_benchmark.py.
+    """
+
+    def __init__(self, environment=None, oidc_username=None, oidc_password=None, **kwargs):
+        self.experiments_dir = os.path.join(FAKE_NRP_DIR, 'experiments')
+        os.makedirs(self.experiments_dir, exist_ok=True)
+
+    def __get_experiment_list(self, cloned=False):
+        return {name: {} for name in os.listdir(self.experiments_dir)}
+
+    def print_cloned_experiments(self):
+        for name in sorted(self.__get_experiment_list(cloned=True)):
+            print(name)
+
+    def import_experiment(self, path):
+        experiment = f"{os.path.basename(os.path.normpath(path))}_{uuid.uuid4().hex[:8]}"
+        os.makedirs(os.path.join(self.experiments_dir, experiment))
+        return ImportResponse(repr({'destFolderName': experiment}).encode('UTF-8'))
+
+    def delete_cloned_experiment(self, experiment_id):
+        shutil.rmtree(os.path.join(self.experiments_dir, experiment_id))
+
+    def launch_experiment(self, experiment_id, server=None, reservation=None,
+                          cloned=True, brain_processes=1, profiler='disabled'):
+        # A new run replaces the profiler data of the last one
+        experiment_dir = os.path.join(self.experiments_dir, experiment_id)
+        shutil.rmtree(os.path.join(experiment_dir, 'profiler'), ignore_errors=True)
+        return Simulation(experiment_dir)
+
+    def get_last_run_file(self, experiment_id, file_type, file_name):
+        fname = os.path.join(self.experiments_dir, experiment_id, file_type, file_name)
+        if not os.path.isfile(fname):
+            raise Exception(f"File {file_name} not found for experiment {experiment_id}")
+        with open(fname, 'rb') as infile:
+            return infile.read()
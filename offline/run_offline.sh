@@ -0,0 +1,78 @@
+#!/bin/bash
+
+# Runs a benchmark campaign on the local machine, using the stand-ins in
+# offline/ instead of Slurm, the NEST container and the NRP frontend.
+
+if [ "$#" -lt 1 ]; then
+    echo "Usage: offline/run_offline.sh <configfile> [<resultsdir>]"
+    echo
+    echo "<configfile> is a yaml file that configures the benchmark, e.g. offline/config.yaml"
+    echo "<resultsdir> results directory of a campaign to resume"
+    exit 1
+fi
+
+cd "$(dirname "$0")/.."
+
+configfile=$1
+resultsdir=$2
+
+repetitions=$(grep 'repetitions:' $configfile | cut -d: -f2 | tr -d ' ' | tr -d '"')
+testcase=$(grep 'testcase:' $configfile | cut -d: -f2 | tr -d ' ' | tr -d '"')
+pack=$(grep '^pack:' $configfile | cut -d: -f2 | tr -d ' ' | tr -d '"')
+pack_size=$(grep '^pack_size:' $configfile | cut -d: -f2 | tr -d ' ' | tr -d '"')
+pack_size=${pack_size:-2}
+
+if [ -z "$resultsdir" ]; then
+    DATE_WITH_TIME=`date "+%Y-%m-%d_%H-%M-%S"`
+    resultsdir=$PWD/tmp_benchmarks_results/$DATE_WITH_TIME-$testcase-offline/results
+    mkdir -p $resultsdir
+    cp $configfile $resultsdir/config.yaml
+fi
+
+if [ ! -f secrets.yaml ]; then
+    cp secrets.yaml.ini secrets.yaml
+    chmod 600 secrets.yaml
+fi
+
+export PATH=$PWD/offline/bin:$PATH
+export PYTHONPATH=$PWD/offline:$PYTHONPATH
+export FAKE_SLURM_DIR=${FAKE_SLURM_DIR:-$resultsdir/../fake_slurm}
+export FAKE_NRP_DIR=${FAKE_NRP_DIR:-$resultsdir/../fake_nrp}
+export SLURM_NODELIST="nid0[0-8]"
+export SLURM_NNODES=9
+export SLURM_JOB_ACCOUNT=offline
+
+n_packed=0
+for (( c=1; c<=$repetitions; c++ ))
+do
+    if python3 campaign_journal.py $resultsdir $configfile $c; then
+        echo "==== OFFLINE: Repetition $c already completed, skipping ==="
+        continue
+    fi
+
+    mkdir -p $resultsdir/$c
+    cp $configfile $resultsdir/$c/config.yaml
+
+    if [ "$pack" = "true" ]; then
+        packed_rundirs="$packed_rundirs $resultsdir/$c"
+        n_packed=$((n_packed + 1))
+        if [ $n_packed -ge $pack_size ]; then
+            echo "==== OFFLINE: Starting $n_packed packed repetitions in $resultsdir ==="
+            export SLURM_JOB_ID=$$$c
+            python3 run_benchmark.py $configfile $packed_rundirs
+            packed_rundirs=""
+            n_packed=0
+        fi
+        continue
+    fi
+
+    echo "==== OFFLINE: Starting repetition $c in $resultsdir/$c ==="
+    export SLURM_JOB_ID=$$$c
+    python3 run_benchmark.py $configfile $resultsdir/$c
+done
+
+if [ -n "$packed_rundirs" ]; then
+    echo "==== OFFLINE: Starting $n_packed packed repetitions in $resultsdir ==="
+    export SLURM_JOB_ID=$$
+    python3 run_benchmark.py $configfile $packed_rundirs
+fi
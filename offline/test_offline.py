@@ -0,0 +1,77 @@
+"""
+End-to-end test of the benchmark runner with the offline stand-ins. Runs a
+small campaign with offline/run_offline.sh for a NEST-only and an NRP test
+case and checks the step results, metadata and journal it produces. Run with
+
+    python3 -m pytest offline/test_offline.py
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+import helpers  # noqa: E402
+
+N_TASKS = [1, 2]
+N_CYCLES = 5
+
+
+def run_campaign(tmp_path, testcase):
+    """
+    Runs a campaign with one repetition of the test case and returns its
+    results directory.
+    """
+
+    config = helpers.get_config(os.path.join(REPO_DIR, 'offline', 'config.yaml'))
+    config.update(testcase=testcase, n_tasks=N_TASKS, n_cycles_nest=N_CYCLES, repetitions=1)
+    resultsdir = tmp_path / 'results'
+    resultsdir.mkdir()
+    configfile = resultsdir / 'config.yaml'
+    with open(configfile, 'w') as outfile:
+        for key, value in config.items():
+            outfile.write(f'{key}: {json.dumps(value)}\n')
+
+    secrets = os.path.join(REPO_DIR, 'secrets.yaml')
+    had_secrets = os.path.exists(secrets)
+    env = dict(os.environ, PATH=f"{os.path.dirname(sys.executable)}:{os.environ['PATH']}")
+    try:
+        subprocess.run([os.path.join(REPO_DIR, 'offline', 'run_offline.sh'),
+                        str(configfile), str(resultsdir)],
+                       env=env, check=True, timeout=600)
+    finally:
+        if not had_secrets and os.path.exists(secrets):
+            os.remove(secrets)
+    return resultsdir
+
+
+@pytest.mark.skipif(shutil.which('bash') is None, reason='needs bash')
+@pytest.mark.parametrize('testcase', ['hpcbench_baseline', 'hpcbench_notf'])
+def test_campaign(tmp_path, testcase):
+    resultsdir = run_campaign(tmp_path, testcase)
+
+    for n_tasks in N_TASKS:
+        rundir = resultsdir / '1' / f'{n_tasks:02d}_ntasks'
+        metadata = helpers.get_config(rundir / 'metadata.yaml')
+        assert metadata.get('step_state', 'completed') == 'completed'
+        assert metadata['nest_num_processes'] == n_tasks
+        assert metadata['nest_time_simulated'] > 0
+        if testcase == 'hpcbench_baseline':
+            with open(rundir / 'step_time.dat') as infile:
+                lines = infile.read().split()
+            assert lines[0] == 'brainstep'
+            assert len(lines) == N_CYCLES + 1
+            assert all(float(line) > 0 for line in lines[1:])
+
+    with open(resultsdir / 'journal.jsonl') as infile:
+        entries = [json.loads(line) for line in infile]
+    completed = {entry['n_tasks'] for entry in entries if entry['state'] == 'completed'}
+    assert completed == set(N_TASKS)
+    for entry in entries:
+        if entry['state'] == 'completed':
+            assert 'metadata.yaml' in entry['artifacts']
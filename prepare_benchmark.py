@@ -15,7 +15,7 @@ config = helpers.get_config(config_fname)
 
 # Create results folder for run
 rundir = sys.argv[2]
-os.makedirs(rundir)
+os.makedirs(rundir, exist_ok=True)
 
 
 # Retrieve Nodelist
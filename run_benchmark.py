@@ -7,14 +7,25 @@ import subprocess
 import requests
 import logging
 import signal
+import threading
 import time
 import sys
 import os
 import math
 import shutil 
+import copy
 
 import helpers
 import ast
+from campaign_journal import CampaignJournal
+from nest_server_client import NestServerClient
+from tracing import StepTrace, write_phase_table
+
+
+# Slurm job states after which accounting data of a job step is final
+JOBSTEP_TERMINAL_STATES = ('BOOT_FAIL', 'CANCELLED', 'COMPLETED', 'DEADLINE',
+                           'FAILED', 'NODE_FAIL', 'OUT_OF_MEMORY', 'PREEMPTED',
+                           'TIMEOUT')
 
 
 class BenchmarkRunner:
@@ -24,56 +35,331 @@ class BenchmarkRunner:
         self.nodelist = helpers.expand_nodelist()
         logger.info("Nodes in allocation: %s", self.nodelist)
         self.jobstep = -1
-        self.running = False
+        self.finished = threading.Event()
+        self.failure = None
+        self.last_progress = (None, 0)
         self.working_dir = os.getcwd()
         self.rundir = rundir
+        self.resultsdir = os.path.dirname(os.path.normpath(rundir))
+        self.repetition = os.path.basename(os.path.normpath(rundir))
+        self.journal = CampaignJournal(self.resultsdir)
+        self.nest_url = f"http://{config.get('nest_host', self.nodelist[1])}:5000"
+        self.nest = NestServerClient(self.nest_url, timeout=config.get('nest_request_timeout'))
+        self.step_info = {}
+        self.teardown_threads = []
+        self.nest_job = None
+        self.busy_jobs = {}  # NEST job steps that did not end yet
+        self.busy_lock = threading.Condition()  # notified when busy_jobs shrinks
+        self.trace = StepTrace(rundir)
+        self.vc = None
 
     def start_nest(self, ntasks):
         """
         Starts the NEST container with the given number of tasks,
-        two tasks on each node.
+        two tasks on each node, and waits until NEST Server is ready.
+        :param ntasks: Number of NEST tasks to run in total
+        """
+
+        n_nodes = math.ceil(float(ntasks)/2)
+        nodes = self.nodelist[1:1 + n_nodes]
+        with self.trace.span('nest_wait_idle'):
+            self.step_info['nest_wait_idle_time'] = self.wait_for_idle_nest_resources(nodes, 5000)
+        job = self.launch_nest(ntasks, self.ntasks_rundir, nodes, 5000)
+        self.activate_nest(job)
+        with self.trace.span('nest_startup'):
+            self.wait_for_nest(job['client'])
+        self.step_info['nest_startup_time'] = time.time() - job['tic']
+        logger.info("  NEST ready after %.1f s", self.step_info['nest_startup_time'])
+
+    def launch_nest(self, ntasks, ntasks_rundir, nodes, port):
+        """
+        Launches a NEST job step on the given nodes without waiting for it
+        and returns a dictionary describing the job step.
         :param ntasks: Number of NEST tasks to run in total
+        :param ntasks_rundir: Result folder of the benchmark step
+        :param nodes: List of nodes to run NEST on
+        :param port: Port for NEST Server to listen on
         """
 
         values = {
-            'n_nodes_nest': math.ceil(float(ntasks)/2),
+            'n_nodes_nest': len(nodes),
             'n_tasks_nest': ntasks,
             'nodezero': self.nodelist[0],
+            'nodes': ",".join(nodes),
+            'port': port,
             'jobid': os.environ.get("SLURM_JOB_ID"),
             'account': os.environ.get("SLURM_JOB_ACCOUNT"),
+            'jobstep': self.jobstep + 1,
         }
         values['working_dir'] = os.getcwd()
 
         logger.info("Starting NEST")
         logger.info("  NEST tasks  : %s", ntasks)
+        logger.info("  NEST nodes  : %s", values['nodes'])
 
-        with open(self.working_dir + "/misc/nest.sh.tpl", 'r') as infile:
-            with open(f'{self.ntasks_rundir}/nest.sh', 'w') as outfile:
+        template = config.get('nest_template', "misc/nest.sh.tpl")
+        with open(os.path.join(self.working_dir, template), 'r') as infile:
+            with open(f'{ntasks_rundir}/nest.sh', 'w') as outfile:
                 outfile.write(f"{infile.read()}".format(**values))
 
-        subprocess.Popen(["bash", f"{self.ntasks_rundir}/nest.sh"])
+        url = f"http://{config.get('nest_host', nodes[0])}:{port}"
+        job = {
+            'id': f"{os.environ.get('SLURM_JOB_ID')}.{self.jobstep + 1}",
+            'nodes': nodes,
+            'port': port,
+            'url': url,
+            'client': NestServerClient(url, timeout=config.get('nest_request_timeout')),
+            'tic': time.time(),
+        }
+        subprocess.Popen(["bash", f"{ntasks_rundir}/nest.sh"])
         self.jobstep += 1
-        time.sleep(180)  # Give the NEST container some time to start
+        with self.busy_lock:
+            self.busy_jobs[job['id']] = job
+        return job
+
+    def activate_nest(self, job):
+        """
+        Makes the given NEST job step the one used by the current benchmark
+        step.
+        :param job: NEST job step as returned by launch_nest()
+        """
+
+        self.nest_job = job
+        self.nest = job['client']
+        self.nest_url = job['url']
+
+    def wait_for_idle_nest_resources(self, nodes, port):
+        """
+        Waits until no other NEST job step uses any of the given nodes or the
+        given port, e.g. the job step of the previous benchmark step that is
+        still being torn down, so that a new NEST Server cannot be mistaken
+        for the old one. Returns the time waited in seconds.
+        :param nodes: List of nodes to run NEST on
+        :param port: Port for NEST Server to listen on
+        """
+
+        def busy():
+            return any(job['port'] == port or set(job['nodes']) & set(nodes)
+                       for job in self.busy_jobs.values())
+
+        tic = time.time()
+        with self.busy_lock:
+            if busy():
+                logger.info("  Waiting for the previous NEST job step to end")
+            while busy():
+                self.busy_lock.wait(timeout=5)
+        return time.time() - tic
+
+    def idle_nest_resources(self, ntasks):
+        """
+        Returns nodes and port for a NEST job step with the given number of
+        tasks that are not used by any other NEST job step, or None if there
+        are not enough idle nodes.
+        :param ntasks: Number of NEST tasks to run in total
+        """
+
+        n_nodes = math.ceil(float(ntasks)/2)
+        with self.busy_lock:
+            busy_nodes = {node for job in self.busy_jobs.values() for node in job['nodes']}
+            busy_ports = {job['port'] for job in self.busy_jobs.values()}
+        idle_nodes = [node for node in self.nodelist[1:] if node not in busy_nodes]
+        if len(idle_nodes) < n_nodes:
+            return None
+        port = 5000
+        while port in busy_ports:
+            port += 1
+        return idle_nodes[:n_nodes], port
+
+    def prestart_nest(self, ntasks):
+        """
+        Launches the NEST job step of the next benchmark step on nodes that
+        are not used by any other NEST job step, and waits for it to become
+        ready in a background thread. Returns None if there are not enough
+        idle nodes.
+        :param ntasks: Number of NEST tasks of the next benchmark step
+        """
+
+        resources = self.idle_nest_resources(ntasks)
+        if resources is None:
+            logger.info("  Not enough idle nodes to prestart NEST with %s tasks", ntasks)
+            return None
+
+        ntasks_rundir = f"{self.rundir}/{ntasks:02d}_ntasks"
+        os.makedirs(ntasks_rundir, exist_ok=True)
+        job = self.launch_nest(ntasks, ntasks_rundir, *resources)
+        job['trace'] = StepTrace(f"{config['testcase']} {self.repetition}/{ntasks:02d}_ntasks")
+
+        def wait(current_trace, current_step):
+            try:
+                self.wait_for_nest(job['client'])
+                job['startup_time'] = time.time() - job['tic']
+            except Exception as e:
+                job['error'] = e
+            end = time.time()
+            job['trace'].add_span('nest_startup', job['tic'], end, 'pipelined',
+                                  overlaps=current_step)
+            current_trace.add_span('next_nest_startup', job['tic'], end, 'overlap',
+                                   step=f"{ntasks:02d}_ntasks")
+
+        job['thread'] = threading.Thread(
+            target=wait, args=(self.trace, os.path.basename(self.ntasks_rundir)),
+            name=f"prestart-{job['id']}",
+        )
+        job['thread'].start()
+        return job
+
+    def use_prestarted_nest(self, job):
+        """
+        Makes a NEST job step launched by prestart_nest() the one used by the
+        current benchmark step, once it is ready.
+        :param job: NEST job step as returned by prestart_nest()
+        """
+
+        self.activate_nest(job)
+        job['thread'].join()
+        if 'error' in job:
+            raise job['error']
+        self.step_info['nest_startup_time'] = job['startup_time']
+        self.step_info['nest_startup_pipelined'] = True
+        logger.info("  Prestarted NEST ready after %.1f s", job['startup_time'])
 
-    def stop_nest(self):
+    def wait_for_nest(self, client):
         """
-        Stops NEST on all nodes and retrieves info data
+        Polls NEST Server until it answers on its index route (and, if
+        configured, on GetKernelStatus). The polling interval grows from
+        one second up to 'nest_startup_poll_max' seconds. Raises a
+        RuntimeError if the server is not up within 'nest_startup_timeout'
+        seconds.
+        :param client: NestServerClient of the NEST Server to wait for
         """
 
-        job_step_id = f"{os.environ.get('SLURM_JOB_ID')}.{self.jobstep}"
+        timeout = config.get('nest_startup_timeout', 600)
+        max_interval = config.get('nest_startup_poll_max', 15)
+        probe_kernel = config.get('nest_startup_probe_kernel', False)
+
+        deadline = time.time() + timeout
+        interval = 1.0
+        while time.time() < deadline:
+            try:
+                client.get(timeout=interval)
+                if probe_kernel:
+                    client.call('GetKernelStatus', timeout=interval)
+                return
+            except requests.exceptions.RequestException:
+                pass
+            time.sleep(min(interval, max(0, deadline - time.time())))
+            interval = min(interval * 1.5, max_interval)
+
+        raise RuntimeError(f"NEST Server at {client.url} not ready after {timeout} s")
+
+    def stop_nest(self, ntasks):
+        """
+        Stops NEST on all nodes and retrieves info data. Waiting for the job
+        step to end and collecting its accounting data happens in a background
+        thread, so that the next benchmark step can already be started.
+        :param ntasks: Number of NEST tasks of the step
+        """
+
+        if self.nest_job is None:
+            # NEST was never launched for this step
+            self.journal.record(config['testcase'], self.repetition, ntasks, 'failed')
+            return
+
+        job_step_id = self.nest_job['id']
         logger.info("Canceling NEST: %s", job_step_id)
         logger.info("  Obtaining metadata from NEST")
-        nest_info = self.get_nest_info()
-        time.sleep(10)
-        subprocess.call(["scancel", job_step_id])
-        logger.info("  Called scancel, sleeping 400 seconds")
-        time.sleep(400)  # Wait for the job to die
-        with open(f'{self.ntasks_rundir}/metadata.yaml', 'w') as outfile:
+        try:
+            with self.trace.span('nest_info'):
+                run_info = self.get_nest_info()
+        except requests.exceptions.RequestException:
+            # NEST Server does not answer while a stuck simulation is running
+            logger.exception("  Obtaining metadata from NEST failed")
+            run_info = {}
+        run_info.update(self.step_info)
+        with self.trace.span('scancel'):
+            subprocess.call(["scancel", job_step_id])
+        logger.info("  Called scancel, collecting sacct data in background")
+
+        thread = threading.Thread(
+            target=self.collect_teardown,
+            args=(job_step_id, self.ntasks_rundir, run_info, time.time(), ntasks, self.trace),
+            name=f"teardown-{job_step_id}",
+        )
+        thread.start()
+        self.teardown_threads.append(thread)
+
+    def collect_teardown(self, job_step_id, ntasks_rundir, run_info, tic, ntasks, trace):
+        """
+        Waits for a cancelled job step to end, writes its metadata and trace
+        and records the outcome of the step in the campaign journal.
+        :param job_step_id: ID of the cancelled job step
+        :param ntasks_rundir: Result folder of the benchmark step
+        :param run_info: Metadata collected so far
+        :param tic: Time at which the job step was cancelled
+        :param ntasks: Number of NEST tasks of the step
+        :param trace: Trace of the benchmark step
+        """
+
+        try:
+            with trace.span('nest_teardown'):
+                state = self.wait_for_jobstep_end(job_step_id)
+            run_info['nest_teardown_time'] = time.time() - tic
+            run_info['nest_teardown_state'] = state
+            logger.info("  Job step %s %s after %.1f s", job_step_id, state,
+                        run_info['nest_teardown_time'])
             logger.info("  Obtaining metadata from sacct")
-            run_info = self.get_sacct_info(job_step_id)
-            run_info.update(nest_info)
-            outfile.write(yaml.dump(run_info, default_flow_style=False))
-        logger.info("  Cancelling complete")
+            with trace.span('sacct'):
+                run_info.update(self.get_sacct_info(job_step_id))
+        except Exception:
+            logger.exception("  Collecting metadata of job step %s failed", job_step_id)
+            run_info['step_state'] = 'failed'
+        finally:
+            with open(f'{ntasks_rundir}/metadata.yaml', 'w') as outfile:
+                outfile.write(yaml.dump(run_info, default_flow_style=False))
+            trace.write(ntasks_rundir)
+            with self.busy_lock:
+                self.busy_jobs.pop(job_step_id, None)
+                self.busy_lock.notify_all()
+            self.journal.record(config['testcase'], self.repetition, ntasks,
+                                run_info.get('step_state', 'completed'),
+                                sorted(os.listdir(ntasks_rundir)))
+
+    def wait_for_jobstep_end(self, job_step_id):
+        """
+        Polls sacct until the given job step reached a terminal state and
+        returns that state. Returns 'TIMEOUT_WAITING' if this does not happen
+        within 'nest_teardown_timeout' seconds.
+        :param job_step_id: ID of the job step to wait for
+        """
+
+        timeout = config.get('nest_teardown_timeout', 600)
+        sacct_cmd = ["sacct", "-j", job_step_id, "-P", "--noheader", "--format=State"]
+
+        deadline = time.time() + timeout
+        interval = 1.0
+        while time.time() < deadline:
+            output = subprocess.check_output(sacct_cmd).decode("utf-8").split()
+            if output and output[0] in JOBSTEP_TERMINAL_STATES:
+                return output[0]
+            time.sleep(interval)
+            interval = min(interval * 1.5, 15)
+
+        return 'TIMEOUT_WAITING'
+
+    def wait_for_jobstep_start(self, job_step_id):
+        """
+        Polls sacct until the given job step is known to Slurm, so that job
+        steps launched afterwards get higher IDs.
+        :param job_step_id: ID of the job step to wait for
+        """
+
+        sacct_cmd = ["sacct", "-j", job_step_id, "-P", "--noheader", "--format=State"]
+        deadline = time.time() + 60
+        while time.time() < deadline:
+            if subprocess.check_output(sacct_cmd).strip():
+                return
+            time.sleep(0.5)
+        logger.warning("  Job step %s not listed by sacct after 60 s", job_step_id)
 
     def get_sacct_info(self, job_step_id):
         """
@@ -98,20 +384,57 @@ class BenchmarkRunner:
         Collects benchmark relevant info from NEST
         """
 
-        url = f"http://{self.nodelist[1]}:5000"
-        headers = {'Content-type': 'application/json', 'Accept': 'text/plain'}
-        response = requests.post(f'{url}/api/GetKernelStatus', json={}, headers=headers)
-        return {
-            "nest_time_create": response.json()["time_construction_create"],
-            "nest_time_connect": response.json()["time_construction_connect"],
-            "nest_time_last_simulate": response.json()["time_simulate"],
-            "nest_num_nodes": response.json()["network_size"],
-            "nest_num_connections": response.json()["num_connections"],
-            "nest_num_processes": response.json()["num_processes"],
-            "nest_local_num_threads": response.json()["local_num_threads"],
-            "nest_time_simulated": response.json()["biological_time"],
+        kernel_status = self.nest.call('GetKernelStatus', timeout=config.get('nest_info_timeout', 120))
+        info = {
+            "nest_time_create": kernel_status["time_construction_create"],
+            "nest_time_connect": kernel_status["time_construction_connect"],
+            "nest_time_last_simulate": kernel_status["time_simulate"],
+            "nest_num_nodes": kernel_status["network_size"],
+            "nest_num_connections": kernel_status["num_connections"],
+            "nest_num_processes": kernel_status["num_processes"],
+            "nest_local_num_threads": kernel_status["local_num_threads"],
+            "nest_time_simulated": kernel_status["biological_time"],
+        }
+
+        try:
+            info["nest_server_metrics"] = self.get_nest_metrics()
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"  Could not scrape metrics of NEST Server: {e}")
+        return info
+
+    def get_nest_metrics(self):
+        """
+        Scrapes the metrics of NEST Server and sums them up per call
+        """
+
+        call_metrics = {
+            "nest_server_calls_total": "count",
+            "nest_server_call_failures_total": "failed",
+            "nest_server_call_duration_seconds_sum": "time",
+            "nest_server_call_local_seconds_total": "time_local",
+            "nest_server_call_mpi_seconds_total": "time_mpi",
+            "nest_server_call_server_seconds_total": "time_server",
+            "nest_server_mpi_bcast_bytes_total": "bcast_bytes",
+            "nest_server_mpi_gather_bytes_total": "gather_bytes",
         }
-   
+        total_metrics = {
+            "nest_server_requests_total": "requests",
+            "nest_server_request_bytes_total": "request_bytes",
+            "nest_server_response_bytes_total": "response_bytes",
+            "nest_server_exec_compile_seconds_total": "exec_compile_time",
+        }
+
+        calls = {}
+        totals = {key: 0 for key in total_metrics.values()}
+        for name, labels, value in self.nest.metrics(timeout=config.get('nest_info_timeout', 120)):
+            value = int(value) if value.is_integer() else value
+            if name in call_metrics and "call" in labels:
+                calls.setdefault(labels["call"], {})[call_metrics[name]] = value
+            elif name in total_metrics:
+                totals[total_metrics[name]] += value
+        totals["calls"] = calls
+        return totals
+
     def run(self):
         """
         Runs the benchmark
@@ -123,16 +446,165 @@ class BenchmarkRunner:
         else:
             n_tasks = config['n_tasks']
 
+        pipelined = config.get('pipeline', False)
+        if pipelined and config['testcase'] != 'hpcbench_baseline':
+            # The NRP always talks to NEST Server on the second node
+            logger.warning("Pipelining is only supported for hpcbench_baseline")
+            pipelined = False
+
+        steps = []
         for n in n_tasks:
+            if self.journal.is_completed(config['testcase'], self.repetition, n):
+                logger.info(f"Skipping completed {config['testcase']} benchmark step with {n} NEST tasks")
+            else:
+                steps.append(n)
+
+        step_traces = {}
+        prestarted = None
+        for i, n in enumerate(steps):
             logger.info(f"Running {config['testcase']} benchmark step with {n} NEST tasks")
             self.ntasks_rundir = f"{self.rundir}/{n:02d}_ntasks"
-            os.makedirs(self.ntasks_rundir)
-            self.start_nest(n)
-            getattr(self, f"run_{config['testcase']}")(n)
-            self.stop_nest()
+            os.makedirs(self.ntasks_rundir, exist_ok=True)
+            self.journal.record(config['testcase'], self.repetition, n, 'started')
+            self.step_info = {}
+            if prestarted is not None:
+                self.trace = prestarted['trace']
+            else:
+                self.trace = StepTrace(f"{config['testcase']} {self.repetition}/{n:02d}_ntasks")
+            step_traces[f"{n:02d}_ntasks"] = self.trace
+            job, prestarted = prestarted, None
+            self.nest_job = None
+            try:
+                if job is not None:
+                    self.use_prestarted_nest(job)
+                else:
+                    self.start_nest(n)
+                getattr(self, f"run_{config['testcase']}")(n)
+            except Exception as e:
+                logger.exception("Benchmark step with %s NEST tasks failed", n)
+                self.step_info['step_state'] = 'failed'
+                self.step_info['step_failure'] = str(e)
+
+            # The next step only starts up after the measurements of this
+            # step, while its metadata is collected and NEST is torn down
+            if pipelined and i + 1 < len(steps):
+                try:
+                    prestarted = self.prestart_nest(steps[i + 1])
+                except Exception:
+                    logger.exception("  Prestarting NEST with %s tasks failed", steps[i + 1])
+                self.step_info['next_nest_prestarted'] = prestarted is not None
+            self.stop_nest(n)
+
+        for thread in self.teardown_threads:
+            thread.join()
+        write_phase_table(step_traces, f"{self.rundir}/phases.csv")
+
+        if config.get('nrp_delete_experiments', False):
+            self.delete_experiments()
 
         logger.info("Benchmarks done!")
  
+    def run_packed(self, rundirs):
+        """
+        Runs the benchmark steps of one or more repetitions concurrently.
+
+        Steps are started largest first on nodes and ports not used by any
+        other NEST job step, so that small steps share the allocation while
+        steps that need the whole allocation run alone.
+        :param rundirs: Run directories of the repetitions to run
+        """
+
+        if config['testcase'] != 'hpcbench_baseline':
+            # The NRP always talks to NEST Server on the second node
+            logger.warning("Packing is only supported for hpcbench_baseline")
+            for rundir in rundirs:
+                self.rundir = rundir
+                self.repetition = os.path.basename(os.path.normpath(rundir))
+                self.run()
+            return
+
+        if 'n_tasks' not in config:
+            n_nodes_max = int(os.environ.get("SLURM_NNODES"))
+            n_tasks = [2**x for x in range(22) if 2**x < n_nodes_max*2]
+        else:
+            n_tasks = config['n_tasks']
+
+        pending = []
+        for rundir in rundirs:
+            repetition = os.path.basename(os.path.normpath(rundir))
+            for n in n_tasks:
+                if self.journal.is_completed(config['testcase'], repetition, n):
+                    logger.info(f"Skipping completed {config['testcase']} benchmark step {repetition} with {n} NEST tasks")
+                elif math.ceil(float(n)/2) > len(self.nodelist) - 1:
+                    logger.error(f"Benchmark step with {n} NEST tasks does not fit the allocation")
+                else:
+                    pending.append((rundir, n))
+        pending.sort(key=lambda step: -step[1])
+
+        step_traces = {rundir: {} for rundir in rundirs}
+        workers = []
+        while pending:
+            with self.busy_lock:
+                while True:
+                    fitting = [(step, self.idle_nest_resources(step[1])) for step in pending]
+                    fitting = [(step, res) for step, res in fitting if res is not None]
+                    if fitting:
+                        break
+                    self.busy_lock.wait(timeout=5)
+
+            (rundir, n), resources = fitting[0]
+            pending.remove((rundir, n))
+            repetition = os.path.basename(os.path.normpath(rundir))
+            logger.info(f"Running {config['testcase']} benchmark step {repetition} with {n} NEST tasks")
+
+            runner = copy.copy(self)
+            runner.rundir = rundir
+            runner.repetition = repetition
+            runner.ntasks_rundir = f"{rundir}/{n:02d}_ntasks"
+            runner.step_info = {'packed_nodes': ",".join(resources[0])}
+            runner.trace = StepTrace(f"{config['testcase']} {repetition}/{n:02d}_ntasks")
+            runner.nest_job = None
+            step_traces[rundir][f"{n:02d}_ntasks"] = runner.trace
+            os.makedirs(runner.ntasks_rundir, exist_ok=True)
+            self.journal.record(config['testcase'], repetition, n, 'started')
+
+            job = self.launch_nest(n, runner.ntasks_rundir, *resources)
+            self.wait_for_jobstep_start(job['id'])
+
+            worker = threading.Thread(target=runner.run_packed_step, args=(job, n),
+                                      name=f"step-{job['id']}")
+            worker.start()
+            workers.append(worker)
+
+        for worker in workers:
+            worker.join()
+        for thread in self.teardown_threads:
+            thread.join()
+        for rundir in rundirs:
+            write_phase_table(step_traces[rundir], f"{rundir}/phases.csv")
+
+        logger.info("Benchmarks done!")
+
+    def run_packed_step(self, job, ntasks):
+        """
+        Runs a single benchmark step on an already launched NEST job step.
+        Used on a copy of the runner by run_packed().
+        :param job: NEST job step as returned by launch_nest()
+        :param ntasks: Number of NEST tasks of the step
+        """
+
+        try:
+            self.activate_nest(job)
+            with self.trace.span('nest_startup'):
+                self.wait_for_nest(job['client'])
+            self.step_info['nest_startup_time'] = time.time() - job['tic']
+            self.run_hpcbench_baseline(ntasks)
+        except Exception as e:
+            logger.exception("Benchmark step with %s NEST tasks failed", ntasks)
+            self.step_info['step_state'] = 'failed'
+            self.step_info['step_failure'] = str(e)
+        self.stop_nest(ntasks)
+
     def run_nrp_benchmark(self, experiment_path):
         """
         Runs a benchmark experiment in the NRP
@@ -140,36 +612,149 @@ class BenchmarkRunner:
                                 imported and run.
         """
 
-        vc = VirtualCoach(
-            f"http://{config['nrp_frontend_ip']}",
-            oidc_username=secrets['hbp_username'],
-            oidc_password=secrets['hbp_password'],
-        )
+        vc = self.get_virtual_coach()
 
-        # Import Experiment
-        self.running = True
-        response_result = vc.import_experiment(experiment_path)
-        dict_content = ast.literal_eval(response_result.content.decode("UTF-8"))
-        self.experiment = dict_content['destFolderName']
-        vc.print_cloned_experiments()
-        time.sleep(30)
+        # Import Experiment, or reuse an earlier clone of it
+        with self.trace.span('experiment_import'):
+            self.experiment = self.get_experiment(experiment_path)
+        self.finished.clear()
+        self.failure = None
         
-        # Launch Experiment
+        # A reused clone still holds the profiler data of its last run
+        previous_profile = self.get_nrp_profiler_data(self.experiment)
+
+        # Launch Experiment; this includes building the network in NEST
         self.tic = time.time()
-        self.sim = vc.launch_experiment(self.experiment, server='148.187.148.198-port-8080', profiler='cle_step')
+        self.last_progress = (None, self.tic)
+        with self.trace.span('experiment_launch'):
+            self.sim = vc.launch_experiment(self.experiment, server='148.187.148.198-port-8080', profiler='cle_step')
 
         self.sim.register_status_callback(self.stop_cb)
-        self.sim.start()
+        with self.trace.span('simulation'):
+            self.sim.start()
+            self.wait_for_experiment()
+        if self.failure is not None:
+            logger.error("  Experiment run failed: %s", self.failure)
+            self.step_info['step_state'] = 'failed'
+            self.step_info['step_failure'] = self.failure
+            return
+
+        self.step_info['step_state'] = 'completed'
+        with self.trace.span('profiler_download'):
+            self.retrieve_nrp_profiler_data(self.experiment, previous_profile)
+
+    def wait_for_experiment(self):
+        """
+        Waits until the running experiment stops. The experiment is aborted
+        and self.failure is set if it runs longer than 'nrp_run_timeout'
+        seconds in total, or if its simulation time does not advance for
+        'nrp_stall_timeout' seconds.
+        """
 
-        while self.running:
-            time.sleep(0.5)
+        run_timeout = config.get('nrp_run_timeout', 14400)
+        stall_timeout = config.get('nrp_stall_timeout', 900)
+
+        while not self.finished.wait(timeout=5):
+            now = time.time()
+            if now - self.tic > run_timeout:
+                self.failure = f"no end after {run_timeout} s"
+            elif now - self.last_progress[1] > stall_timeout:
+                self.failure = f"no progress for {stall_timeout} s"
+            else:
+                continue
+
+            logger.error("  Aborting experiment: %s", self.failure)
+            try:
+                self.sim.stop()
+            except Exception:
+                logger.exception("  Stopping the experiment failed")
+            self.finished.wait(timeout=60)
+            return
+
+    def get_virtual_coach(self):
+        """
+        Returns the VirtualCoach session of this campaign. The login to the
+        frontend only happens on the first call.
+        """
+
+        if self.vc is None:
+            self.vc = VirtualCoach(
+                f"http://{config['nrp_frontend_ip']}",
+                oidc_username=secrets['hbp_username'],
+                oidc_password=secrets['hbp_password'],
+            )
+        return self.vc
+
+    def get_cloned_experiments(self):
+        """
+        Returns the IDs of all cloned experiments of the current user.
+        """
+
+        # VirtualCoach only offers to print this list
+        return self.get_virtual_coach()._VirtualCoach__get_experiment_list(cloned=True).keys()
+
+    def get_experiment(self, experiment_path):
+        """
+        Returns the ID of a cloned experiment with the current content of the
+        given experiment folder. The folder is only imported if no such clone
+        exists yet. Clones are registered by the content hash of the folder in
+        'experiments.yaml' in the results directory, so later repetitions of
+        the campaign can reuse them as well.
+        :param experiment_path: Path of the experiment folder
+        """
 
-        time.sleep(20)
+        registry_fname = os.path.join(self.resultsdir, "experiments.yaml")
+        registry = {}
+        if os.path.isfile(registry_fname):
+            with open(registry_fname, 'r') as infile:
+                registry = yaml.safe_load(infile) or {}
 
-        self.retrieve_nrp_profiler_data(self.experiment)
+        content_hash = helpers.hash_folder(experiment_path)
+        experiment = registry.get(content_hash)
+        if experiment is not None and experiment in self.get_cloned_experiments():
+            logger.info("Reusing cloned experiment %s", experiment)
+            return experiment
+
+        logger.info("Importing experiment %s", experiment_path)
+        response_result = self.get_virtual_coach().import_experiment(experiment_path)
+        dict_content = ast.literal_eval(response_result.content.decode("UTF-8"))
+        experiment = dict_content['destFolderName']
+        self.wait_for_clone(experiment)
 
-        # Delete Experiment after run
-        vc.delete_cloned_experiment(self.experiment)
+        registry[content_hash] = experiment
+        with open(registry_fname, 'w') as outfile:
+            outfile.write(yaml.dump(registry, default_flow_style=False))
+        return experiment
+
+    def wait_for_clone(self, experiment):
+        """
+        Waits until an imported experiment shows up in the list of cloned
+        experiments. Raises a RuntimeError if this does not happen within
+        'nrp_clone_timeout' seconds.
+        :param experiment: ID of the imported experiment
+        """
+
+        timeout = config.get('nrp_clone_timeout', 300)
+        deadline = time.time() + timeout
+        while experiment not in self.get_cloned_experiments():
+            if time.time() > deadline:
+                raise RuntimeError(f"Experiment {experiment} not available after {timeout} s")
+            time.sleep(2)
+
+    def delete_experiments(self):
+        """
+        Deletes all cloned experiments registered for this campaign.
+        """
+
+        registry_fname = os.path.join(self.resultsdir, "experiments.yaml")
+        if not os.path.isfile(registry_fname):
+            return
+        with open(registry_fname, 'r') as infile:
+            registry = yaml.safe_load(infile) or {}
+        for experiment in registry.values():
+            logger.info("Deleting cloned experiment %s", experiment)
+            self.get_virtual_coach().delete_cloned_experiment(experiment)
+        os.remove(registry_fname)
 
     def stop_cb(self, status):
         """
@@ -178,26 +763,51 @@ class BenchmarkRunner:
         :param status: New status of the experiment
         """
 
+        sim_time = status.get('simulationTime')
+        if sim_time is not None and sim_time != self.last_progress[0]:
+            self.last_progress = (sim_time, time.time())
+
         if status['state'] == 'stopped' or status['state'] == 'halted':
-            with open(f'{self.ntasks_rundir}/total_time.dat', "w+") as logfile:
-                logfile.write(str(time.time() - self.tic))
-            self.running = False
+            if self.failure is None:
+                with open(f'{self.ntasks_rundir}/total_time.dat', "w+") as logfile:
+                    logfile.write(str(time.time() - self.tic))
+            self.finished.set()
 
-    def retrieve_nrp_profiler_data(self, experiment_id):
+    def get_nrp_profiler_data(self, experiment_id):
         """
-        Retrieves the experiment profiler data after a benchmark run.
+        Returns the profiler data of the last run of an experiment, or None
+        if there is none yet.
         :param experiment_id: Experiment ID that data shall be retrieved from.
         """
 
-        vc = VirtualCoach(
-            f"http://{config['nrp_frontend_ip']}",
-            oidc_username=secrets['hbp_username'],
-            oidc_password=secrets['hbp_password'],
-        )
+        try:
+            return self.get_virtual_coach().get_last_run_file(
+                experiment_id, 'profiler', 'cle_time_profile_0.csv') or None
+        except Exception:
+            return None
+
+    def retrieve_nrp_profiler_data(self, experiment_id, previous_profile=None):
+        """
+        Retrieves the experiment profiler data after a benchmark run.
+        :param experiment_id: Experiment ID that data shall be retrieved from.
+        :param previous_profile: Profiler data of the experiment before the
+            run, which is not accepted as data of this run
+        """
 
         file_path = os.path.join(self.ntasks_rundir,"cle_time_profile_0.csv")
         logger.info("Saving CLE profiler data from experiment: {} to {}".format(experiment_id, file_path))
-        cle_step_data = vc.get_last_run_file(experiment_id, 'profiler', 'cle_time_profile_0.csv')
+
+        # The profiler data is stored asynchronously after the experiment ended
+        timeout = config.get('nrp_profiler_timeout', 300)
+        deadline = time.time() + timeout
+        while True:
+            cle_step_data = self.get_nrp_profiler_data(experiment_id)
+            if cle_step_data is not None and cle_step_data != previous_profile:
+                break
+            if time.time() > deadline:
+                raise RuntimeError(f"No new profiler data for {experiment_id} after {timeout} s")
+            time.sleep(2)
+
         with open(file_path, "wb") as f_data:
             f_data.write(cle_step_data)
 
@@ -230,28 +840,56 @@ class BenchmarkRunner:
         simtime = 20.0
         logger.info(f'Running hpcbench_base with {ntasks} processes, 2 per node')
 
-        url = f"http://{self.nodelist[1]}:5000"
-        headers = {'Content-type': 'application/json', 'Accept': 'text/plain'}
-        requests.post(f'{url}/api/ResetKernel', json={}, headers=headers)
+        with self.trace.span('reset_kernel'):
+            self.nest.call('ResetKernel')
 
         tic = time.time()
-        data = {'source': open('Experiments/HPC_benchmark/0_hpcbench_baseline.py').read()}
-        requests.post(f'{url}/exec', json=data, headers=headers)
+        with open('Experiments/HPC_benchmark/0_hpcbench_baseline.py') as script:
+            with self.trace.span('network_build'):
+                self.nest.exec(script.read())
         with open(f'{self.ntasks_rundir}/exec_time.dat', "w") as logfile:
             logfile.write(str(time.time() - tic))
 
-        sim_times = []
-        data = {'t': simtime}
-        for cycle in range(config['n_cycles_nest']):
-            tic = time.time()
-            requests.post(f'{url}/api/Simulate', json=data, headers=headers)
-            sim_times.append(time.time() - tic)
+        # With more than one step per call, the steps are simulated with
+        # RunSteps of the patched NEST Server instead of one Simulate each
+        steps_per_call = config.get('nest_steps_per_call', 1)
+        self.step_info['nest_steps_per_call'] = steps_per_call
 
-        with open(f'{self.ntasks_rundir}/step_time.dat', "w") as logfile:
-            d
-            logfile.write(f'brainstep\n')
-            for t in sim_times:
-                logfile.write(f"{t}\n")
+        self.nest.reset_timings()
+        data = {'t': simtime}
+        call_steps = []
+        for cycle in range(0, config['n_cycles_nest'], steps_per_call):
+            steps = min(steps_per_call, config['n_cycles_nest'] - cycle)
+            with self.trace.span('simulation', cycle=cycle, steps=steps):
+                if steps_per_call > 1:
+                    self.nest.run_steps(steps, simtime)
+                else:
+                    self.nest.call('Simulate', data)
+            call_steps.append(steps)
+        sim_timings = self.nest.timings
+        sim_times = [timing['total'] for timing in sim_timings]
+
+        # step_time.dat only holds measured times of one call per step.
+        # Calls of several steps go to run_steps_time.dat with their number
+        # of steps instead.
+        if steps_per_call > 1:
+            with open(f'{self.ntasks_rundir}/run_steps_time.dat', "w") as logfile:
+                logfile.write('runsteps,steps\n')
+                for t, steps in zip(sim_times, call_steps):
+                    logfile.write(f"{t},{steps}\n")
+        else:
+            with open(f'{self.ntasks_rundir}/step_time.dat', "w") as logfile:
+                logfile.write(f'brainstep\n')
+                for t in sim_times:
+                    logfile.write(f"{t}\n")
+
+        # Same first column as step_time.dat or run_steps_time.dat, plus
+        # the split into transport and server time of each call
+        with open(f'{self.ntasks_rundir}/step_time_detail.dat', "w") as logfile:
+            logfile.write('brainstep,request,connect,send,server,receive,new_connection\n')
+            for t in sim_timings:
+                logfile.write(f"{t['total']},{t['request']},{t['connect']},{t['send']},"
+                              f"{t['server']},{t['receive']},{int(t['new_connection'])}\n")
 
         with open(f'{self.ntasks_rundir}/total_time.dat', "w") as logfile:
             logfile.write(str(sum(sim_times)))
@@ -304,18 +942,26 @@ class BenchmarkRunner:
 
 if __name__ == '__main__':
 
-    if len(sys.argv) != 2:
-        "Usage: run_benchmarks.py <configfile>"
+    if len(sys.argv) < 3:
+        print("Usage: run_benchmark.py <configfile> <rundir> [<rundir> ...]")
+        exit(1)
 
-    FORMAT = '[%(asctime)-15s - %(user)-8s] %(message)s'
-    logging.basicConfig(format=FORMAT)
+    FORMAT = '[%(asctime)-15s - %(name)-8s] %(message)s'
+    logging.basicConfig(format=FORMAT, level=logging.INFO)
+    logging.getLogger('urllib3').setLevel(logging.ERROR)
     logger = logging.getLogger('BenchmarkRunner')
 
     config = helpers.get_config(sys.argv[1])
-    rundir = sys.argv[2]
+    rundirs = sys.argv[2:]
     secrets = helpers.get_secrets()
 
     logger.info('BF in here')
-    runner = BenchmarkRunner(rundir)
-    runner.run()
+    runner = BenchmarkRunner(rundirs[0])
+    if config.get('pack', False):
+        runner.run_packed(rundirs)
+    else:
+        for rundir in rundirs:
+            runner.rundir = rundir
+            runner.repetition = os.path.basename(os.path.normpath(rundir))
+            runner.run()
     
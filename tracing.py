@@ -0,0 +1,109 @@
+from contextlib import contextmanager
+import threading
+import json
+import time
+import os
+
+
+class StepTrace:
+    """
+    Collects timestamped spans of the phases of a benchmark step.
+
+    The spans can be written in the Chrome trace event format, which can be
+    opened in chrome://tracing or https://ui.perfetto.dev, and as a table
+    that sums up the time spent in each phase.
+    """
+
+    def __init__(self, name):
+        """
+        :param name: Name of the traced step, shown as process name
+        """
+
+        self.name = name
+        self.lock = threading.Lock()
+        self.events = []
+        self.threads = {}
+
+    def add_span(self, name, start, end, category='step', **args):
+        """
+        Adds a span with the given start and end time.
+        :param name: Name of the phase
+        :param start: Start time as returned by time.time()
+        :param end: End time as returned by time.time()
+        :param category: Category of the span
+        """
+
+        thread = threading.current_thread()
+        with self.lock:
+            self.threads[thread.ident] = thread.name
+            self.events.append({
+                'name': name,
+                'cat': category,
+                'ph': 'X',
+                'ts': start * 1e6,
+                'dur': (end - start) * 1e6,
+                'pid': os.getpid(),
+                'tid': thread.ident,
+                'args': args,
+            })
+
+    @contextmanager
+    def span(self, name, category='step', **args):
+        """
+        Context manager that records the enclosed block as a span.
+        """
+
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add_span(name, start, time.time(), category, **args)
+
+    def phases(self):
+        """
+        Returns a dictionary with number of spans and total duration in
+        seconds for each phase, in order of first appearance.
+        """
+
+        phases = {}
+        with self.lock:
+            for event in sorted(self.events, key=lambda event: event['ts']):
+                count, total = phases.get(event['name'], (0, 0.0))
+                phases[event['name']] = (count + 1, total + event['dur'] / 1e6)
+        return phases
+
+    def write(self, folder):
+        """
+        Writes the trace to trace.json and the phase table to phases.csv.
+        :param folder: Folder to write the files to
+        """
+
+        with self.lock:
+            metadata = [{'name': 'process_name', 'ph': 'M', 'pid': os.getpid(),
+                         'args': {'name': self.name}}]
+            metadata += [{'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(),
+                          'tid': ident, 'args': {'name': name}}
+                         for ident, name in self.threads.items()]
+            trace = {'traceEvents': metadata + self.events, 'displayTimeUnit': 'ms'}
+
+        with open(os.path.join(folder, 'trace.json'), 'w') as outfile:
+            json.dump(trace, outfile)
+
+        with open(os.path.join(folder, 'phases.csv'), 'w') as outfile:
+            outfile.write('phase,count,total\n')
+            for name, (count, total) in self.phases().items():
+                outfile.write(f'{name},{count},{total}\n')
+
+
+def write_phase_table(traces, fname):
+    """
+    Writes the phase tables of several steps into one file.
+    :param traces: Dictionary of step label to StepTrace
+    :param fname: Name of the file to write
+    """
+
+    with open(fname, 'w') as outfile:
+        outfile.write('step,phase,count,total\n')
+        for label, trace in traces.items():
+            for name, (count, total) in trace.phases().items():
+                outfile.write(f'{label},{name},{count},{total}\n')